@@ -1,9 +1,562 @@
 """
 AI services using Google Gemini API
 """
-import google.generativeai as genai
+import hashlib
 import json
-from config import GEMINI_MODEL, MAX_TEXT_LENGTH
+import threading
+import time
+from collections import OrderedDict
+from config import (
+    GEMINI_MODEL,
+    MODEL_POOL_SIZE,
+    MODEL_TIERS,
+    TIER_ORDER,
+    OPERATION_ROUTES,
+    SMALL_INPUT_TOKENS,
+    ROUTE_LATENCY_BUDGET,
+    ROUTE_COST_BUDGET,
+    SINGLE_FLIGHT_TIMEOUT,
+    CONTEXT_CACHE_MIN_TOKENS,
+    CONTEXT_CACHE_TTL,
+    CACHED_INPUT_COST_RATIO,
+    DOCUMENT_SESSION_POOL_SIZE,
+    MAX_TEXT_LENGTH,
+    EXTRACTIVE_SUMMARY_SENTENCES,
+    BRIEF_INPUT_LENGTH,
+    QUESTION_CACHE_THRESHOLD,
+    QUESTION_CACHE_WORD_THRESHOLD,
+    QUESTION_CACHE_MAX_ENTRIES,
+    QUESTION_CACHE_MAX_DOCUMENTS,
+    QUESTION_CACHE_TTL_SECONDS
+)
+from extractive_summarizer import extractive_summary, compress_text
+from jobs import JobCancelled, JobTimeout, check_cancelled
+from pdf_processor import get_document_hash, select_pages
+from question_cache import QuestionCache
+from summary_tree import get_summary_tree, find_relevant_pages
+import usage_ledger
+
+# Shared by every session in this process
+question_cache = QuestionCache(
+    threshold=QUESTION_CACHE_THRESHOLD,
+    max_entries=QUESTION_CACHE_MAX_ENTRIES,
+    max_documents=QUESTION_CACHE_MAX_DOCUMENTS,
+    ttl_seconds=QUESTION_CACHE_TTL_SECONDS,
+    word_threshold=QUESTION_CACHE_WORD_THRESHOLD
+)
+
+_genai = None
+_model_factory = None
+_model_pool = OrderedDict()
+_model_pool_lock = threading.Lock()
+
+def _get_genai():
+    """Import and configure the Gemini SDK on first use"""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        from config import get_gemini_api_key
+        genai.configure(api_key=get_gemini_api_key())
+        _genai = genai
+    return _genai
+
+def set_model_factory(factory):
+    """
+    Replace how model clients are created, e.g. with an offline fake
+    
+    Args:
+        factory (callable): (model_name, generation_config) -> model client,
+            or None to go back to the Gemini SDK
+    """
+    global _model_factory
+    with _model_pool_lock:
+        _model_factory = factory
+        _model_pool.clear()
+    with _document_sessions_lock:
+        _document_sessions.clear()
+
+def get_model(model_name=GEMINI_MODEL, generation_config=None):
+    """
+    Get a model client from the pool, creating it on first use
+    
+    Clients are keyed by model name and settings and the least recently
+    used one is dropped once the pool holds MODEL_POOL_SIZE clients.
+    
+    Args:
+        model_name (str): Gemini model name
+        generation_config (dict): Optional generation settings
+        
+    Returns:
+        GenerativeModel: Reusable model client
+    """
+    key = (model_name, json.dumps(generation_config, sort_keys=True))
+    with _model_pool_lock:
+        model = _model_pool.get(key)
+        if model is None:
+            if _model_factory is not None:
+                model = _model_factory(model_name, generation_config)
+            else:
+                model = _get_genai().GenerativeModel(
+                    model_name,
+                    generation_config=generation_config
+                )
+            _model_pool[key] = model
+            while len(_model_pool) > MODEL_POOL_SIZE:
+                _model_pool.popitem(last=False)
+        else:
+            _model_pool.move_to_end(key)
+        return model
+
+def estimate_tokens(text):
+    """Rough token count for routing decisions (about 4 characters per token)"""
+    return len(text) // 4
+
+def estimate_cost(tier, input_tokens, output_tokens, cached_tokens=0):
+    """
+    Estimate the cost of a call in USD
+    
+    Args:
+        tier (str): Tier name from MODEL_TIERS
+        input_tokens (int): Prompt tokens, including cached ones
+        output_tokens (int): Response tokens
+        cached_tokens (int): Prompt tokens served from a provider context cache
+        
+    Returns:
+        float: Estimated cost
+    """
+    settings = MODEL_TIERS[tier]
+    billed_input = input_tokens - cached_tokens * (1 - CACHED_INPUT_COST_RATIO)
+    return (billed_input * settings["input_cost"] + output_tokens * settings["output_cost"]) / 1_000_000
+
+def estimate_latency(tier, input_tokens):
+    """Estimate the latency of a call in seconds"""
+    settings = MODEL_TIERS[tier]
+    return settings["base_latency"] + settings["latency_per_1k_tokens"] * input_tokens / 1000
+
+def choose_route(operation, input_tokens, latency_budget=ROUTE_LATENCY_BUDGET, cost_budget=ROUTE_COST_BUDGET):
+    """
+    Pick the model tiers to try for a call, in order
+    
+    Small inputs go to the cheapest tier. Otherwise the operation's preferred
+    tier is used, stepping down while it would exceed the latency or cost
+    budget. Cheaper tiers follow as throttling fallbacks, nearest first, then
+    tiers up to the preferred one that fit the budgets.
+    
+    Args:
+        operation (str): Operation name from OPERATION_ROUTES
+        input_tokens (int): Estimated prompt tokens
+        latency_budget (float): Maximum expected latency in seconds, or None
+        cost_budget (float): Maximum expected cost in USD, or None
+        
+    Returns:
+        list: Tier names, primary first
+    """
+    route = OPERATION_ROUTES.get(operation, OPERATION_ROUTES["default"])
+    preferred = TIER_ORDER.index(route["tier"])
+    
+    def within_budget(tier):
+        over_latency = latency_budget is not None and estimate_latency(tier, input_tokens) > latency_budget
+        over_cost = cost_budget is not None and estimate_cost(tier, input_tokens, route["output_tokens"]) > cost_budget
+        return not (over_latency or over_cost)
+    
+    index = 0 if input_tokens <= SMALL_INPUT_TOKENS else preferred
+    while index > 0 and not within_budget(TIER_ORDER[index]):
+        index -= 1
+    
+    # Fall back to cheaper tiers first; never escalate past the operation's
+    # preferred tier or to a tier that fails the budgets
+    fallbacks = list(range(index - 1, -1, -1)) + [
+        i for i in range(index + 1, preferred + 1) if within_budget(TIER_ORDER[i])
+    ]
+    return [TIER_ORDER[i] for i in [index] + fallbacks]
+
+def _is_throttled(error):
+    """Whether an API error means the model is rate limited or overloaded"""
+    name = type(error).__name__
+    return name in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable") or "429" in str(error)
+
+_route_stats = {}
+_route_stats_lock = threading.Lock()
+
+def _record_route(operation, tier, latency, response=None, error=None, input_tokens=0):
+    """Record the outcome of a routed call for get_route_stats and the usage ledger"""
+    usage = getattr(response, "usage_metadata", None)
+    if error is None:
+        input_tokens = getattr(usage, "prompt_token_count", None) or input_tokens
+        output_tokens = getattr(usage, "candidates_token_count", None) or 0
+        cached_tokens = getattr(usage, "cached_content_token_count", None) or 0
+    else:
+        input_tokens = output_tokens = cached_tokens = 0
+    cost = estimate_cost(tier, input_tokens, output_tokens, cached_tokens)
+    usage_ledger.record_call(
+        operation,
+        MODEL_TIERS[tier]["model"],
+        input_tokens,
+        output_tokens,
+        latency,
+        cost,
+        error=str(error) if error is not None else None
+    )
+    
+    with _route_stats_lock:
+        stats = _route_stats.setdefault((operation, tier), {
+            "calls": 0,
+            "errors": 0,
+            "throttled": 0,
+            "total_latency": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cost": 0.0
+        })
+        stats["calls"] += 1
+        stats["total_latency"] += latency
+        if error is not None:
+            stats["errors"] += 1
+            if _is_throttled(error):
+                stats["throttled"] += 1
+            return
+        stats["input_tokens"] += input_tokens
+        stats["output_tokens"] += output_tokens
+        stats["cost"] += cost
+
+def get_route_stats():
+    """
+    Per-route latency and cost for tuning the routing policy
+    
+    Returns:
+        list: One dictionary per (operation, tier) route
+    """
+    with _route_stats_lock:
+        return [
+            dict(stats, operation=operation, tier=tier,
+                 avg_latency=stats["total_latency"] / stats["calls"] if stats["calls"] else 0.0)
+            for (operation, tier), stats in sorted(_route_stats.items())
+        ]
+
+def _call_routed(prompt, operation, generation_config, latency_budget, cost_budget, context=None):
+    """Run a prompt on the routed tiers, falling back when the primary one is throttled"""
+    input_tokens = estimate_tokens(prompt) + (context.tokens if context is not None else 0)
+    tiers = choose_route(operation, input_tokens, latency_budget, cost_budget)
+    
+    for attempt, tier in enumerate(tiers):
+        # Stop before spending quota on a cancelled or expired job or past a hard budget
+        check_cancelled()
+        usage_ledger.check_budget()
+        model_name = MODEL_TIERS[tier]["model"]
+        model = context.cached_model(model_name) if context is not None else None
+        if model is not None:
+            # The document is already held by the provider; send only the instruction
+            payload = prompt
+        else:
+            model = get_model(model_name, generation_config)
+            payload = context.prefix + prompt if context is not None else prompt
+        if context is not None:
+            context.record_call(payload, cached=payload is prompt)
+        start = time.perf_counter()
+        try:
+            response = model.generate_content(payload)
+        except Exception as e:
+            _record_route(operation, tier, time.perf_counter() - start, error=e)
+            if _is_throttled(e) and attempt < len(tiers) - 1:
+                continue
+            raise
+        _record_route(operation, tier, time.perf_counter() - start, response, input_tokens=input_tokens)
+        return response
+
+# Errors raised for the caller's own job or budget rather than by the model call
+_CALLER_ERRORS = (JobCancelled, JobTimeout, usage_ledger.BudgetExceeded)
+
+class _InFlightCall:
+    """A model call that other callers with the same key can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one
+    
+    The first caller for a key runs the call; callers arriving while it is
+    in flight wait for it and receive the same result or exception. If the
+    first caller's call stops because of its own job or budget (cancelled,
+    past its deadline, or over its session budget), a waiting caller takes
+    over the call.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None, poll_interval=0.5):
+        """
+        Run fn once for all concurrent callers with the same key
+        
+        Args:
+            key (str): Request key
+            fn (callable): Call to run if none is in flight
+            timeout (float): Seconds a waiting caller waits before giving up
+            poll_interval (float): Seconds between checks of the waiting
+                caller's own job
+            
+        Returns:
+            Result of fn
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _InFlightCall()
+                    self.executed += 1
+                else:
+                    self.coalesced += 1
+            
+            if leader:
+                try:
+                    call.result = fn()
+                except Exception as e:
+                    call.error = e
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.done.set()
+            else:
+                give_up = time.monotonic() + timeout if timeout is not None else None
+                while not call.done.wait(poll_interval):
+                    # A waiter whose own job was cancelled or ran past its deadline stops waiting
+                    check_cancelled()
+                    if give_up is not None and time.monotonic() > give_up:
+                        raise TimeoutError("Timed out waiting for an identical in-flight request")
+                if isinstance(call.error, _CALLER_ERRORS):
+                    continue
+            
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def stats(self):
+        """
+        Coalescing statistics
+        
+        Returns:
+            dict: Calls executed, calls coalesced and calls currently in flight
+        """
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls)
+            }
+
+# Shared by every session in this process
+single_flight = SingleFlight()
+
+def _generate_content(prompt, operation="default", generation_config=None,
+                      latency_budget=ROUTE_LATENCY_BUDGET, cost_budget=ROUTE_COST_BUDGET,
+                      context=None):
+    """
+    Run a prompt on the model tier chosen for the operation
+    
+    Identical requests already in flight are coalesced into one model call,
+    and the primary tier falls back to another one when it is throttled.
+    
+    Args:
+        prompt (str): Full prompt, or only the instruction when context is given
+        operation (str): Operation name from OPERATION_ROUTES
+        generation_config (dict): Optional generation settings
+        latency_budget (float): Maximum expected latency in seconds, or None
+        cost_budget (float): Maximum expected cost in USD, or None
+        context (DocumentSession): Registered document the prompt refers to
+        
+    Returns:
+        GenerateContentResponse: Model response
+    """
+    key = hashlib.sha256(json.dumps(
+        [prompt, operation, generation_config, latency_budget, cost_budget,
+         context.document_hash if context is not None else None],
+        sort_keys=True
+    ).encode("utf-8")).hexdigest()
+    return single_flight.do(
+        key,
+        lambda: _call_routed(prompt, operation, generation_config, latency_budget, cost_budget, context),
+        timeout=SINGLE_FLIGHT_TIMEOUT
+    )
+
+_context_cache_factory = None
+_document_sessions = OrderedDict()
+_document_sessions_lock = threading.Lock()
+
+def set_context_cache(factory):
+    """
+    Replace how provider-side document caches are created, e.g. with an offline fake
+    
+    Args:
+        factory (callable): (model_name, document, ttl_seconds) -> model client
+            bound to the cached document, or None to use the Gemini SDK
+    """
+    global _context_cache_factory
+    with _document_sessions_lock:
+        _context_cache_factory = factory
+        _document_sessions.clear()
+
+def _provider_caching_available():
+    """Whether document contexts can be cached by the provider"""
+    if _context_cache_factory is not None:
+        return True
+    if _model_factory is not None:
+        # Offline model factories have no provider cache unless one is set
+        return False
+    return hasattr(_get_genai(), "caching")
+
+def _create_cached_model(model_name, document):
+    """Register a document with the provider and get a client bound to it"""
+    if _context_cache_factory is not None:
+        return _context_cache_factory(model_name, document, CONTEXT_CACHE_TTL)
+    import datetime
+    genai = _get_genai()
+    cache = genai.caching.CachedContent.create(
+        model=f"models/{model_name}",
+        contents=[f"Document:\n{document}"],
+        ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL)
+    )
+    return genai.GenerativeModel.from_cached_content(cached_content=cache)
+
+class DocumentSession:
+    """
+    A document context registered once and reused across operations
+    
+    Where the provider supports context caching, the document is uploaded
+    once per model and later calls send only the instruction. Otherwise every
+    call starts with the same document prefix, so prompts share a stable
+    prefix that providers can reuse implicitly.
+    """
+
+    def __init__(self, document):
+        self.document_hash = get_document_hash(document)
+        self.prefix = f"Document:\n{document}\n\n"
+        self.tokens = estimate_tokens(self.prefix)
+        self._document = document
+        self._cached_models = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.cached_calls = 0
+        self.payload_chars = 0
+
+    def cached_model(self, model_name):
+        """
+        Model client bound to the provider-cached document
+        
+        Args:
+            model_name (str): Gemini model name
+            
+        Returns:
+            Model client, or None when the document is too small to cache or
+            caching is unavailable
+        """
+        if self.tokens < CONTEXT_CACHE_MIN_TOKENS or not _provider_caching_available():
+            return None
+        with self._lock:
+            entry = self._cached_models.get(model_name)
+            if entry is None or entry[1] < time.time():
+                try:
+                    model = _create_cached_model(model_name, self._document)
+                except Exception:
+                    # Fall back to the shared prefix for this model
+                    model = None
+                # Refresh a little before the provider expires the cache
+                entry = (model, time.time() + CONTEXT_CACHE_TTL - 60)
+                self._cached_models[model_name] = entry
+            return entry[0]
+
+    def record_call(self, payload, cached):
+        with self._lock:
+            self.calls += 1
+            self.cached_calls += int(cached)
+            self.payload_chars += len(payload)
+
+    def generate(self, instruction, operation):
+        """
+        Run an instruction against the document
+        
+        Args:
+            instruction (str): Instruction or question, without the document
+            operation (str): Operation name from OPERATION_ROUTES
+            
+        Returns:
+            GenerateContentResponse: Model response
+        """
+        return _generate_content(instruction, operation=operation, context=self)
+
+    def stats(self):
+        """
+        Payload statistics
+        
+        Returns:
+            dict: Calls, calls served from the provider cache and average payload size
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "cached_calls": self.cached_calls,
+                "avg_payload_chars": self.payload_chars / self.calls if self.calls else 0
+            }
+
+def get_document_session(document):
+    """
+    Get the shared session for a document body, registering it on first use
+    
+    Args:
+        document (str): Document text sent to the model
+        
+    Returns:
+        DocumentSession: Session shared by every operation and user of the document
+    """
+    document_hash = get_document_hash(document)
+    with _document_sessions_lock:
+        session = _document_sessions.get(document_hash)
+        if session is None:
+            session = _document_sessions[document_hash] = DocumentSession(document)
+            while len(_document_sessions) > DOCUMENT_SESSION_POOL_SIZE:
+                _document_sessions.popitem(last=False)
+        else:
+            _document_sessions.move_to_end(document_hash)
+        return session
+
+def _generate_text(prompt, operation):
+    """Run a prompt and return the response text (used to build summary trees)"""
+    return _generate_content(prompt, operation=operation).text
+
+def _format_tree_nodes(nodes):
+    """Format summary tree nodes as page-labelled document text"""
+    return "".join(
+        f"\n\n--- Pages {node['pages'][0]}-{node['pages'][1]} ---\n\n{node['summary']}"
+        for node in nodes
+    )
+
+def _generate_with_document(instruction, document, operation, reusable=True):
+    """
+    Run an instruction against a document, document first
+    
+    Reusable documents (the ones several operations and users send) go
+    through their shared DocumentSession; one-off bodies such as pages
+    selected for a single question are sent inline with the same layout.
+    
+    Args:
+        instruction (str): Instruction that refers to "the document above"
+        document (str): Document body
+        operation (str): Operation name from OPERATION_ROUTES
+        reusable (bool): Whether the document is likely to be sent again
+        
+    Returns:
+        GenerateContentResponse: Model response
+    """
+    if reusable:
+        return get_document_session(document).generate(instruction, operation)
+    return _generate_content(f"Document:\n{document}\n\n{instruction}", operation=operation)
 
 def generate_summary(text, summary_type="comprehensive"):
     """
@@ -11,38 +564,53 @@ def generate_summary(text, summary_type="comprehensive"):
     
     Args:
         text (str): Document text
-        summary_type (str): Type of summary ('comprehensive', 'brief', 'reference-linked')
+        summary_type (str): Type of summary ('comprehensive', 'brief', 'reference-linked', 'extractive')
         
     Returns:
         str: Generated summary or None if error
     """
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
+        if summary_type == "extractive":
+            # Runs locally, no model call
+            return extractive_summary(text, EXTRACTIVE_SUMMARY_SENTENCES)
+        
+        # Documents that do not fit in one prompt are summarized from the
+        # persisted summary tree instead of a truncated prefix
+        tree = get_summary_tree(text, _generate_text) if len(text) > MAX_TEXT_LENGTH else None
+        operation = f"summary:{summary_type}"
         
         if summary_type == "comprehensive":
-            prompt = f"""Provide a comprehensive summary of the following document. 
+            document = _format_tree_nodes(tree["sections"]) if tree else text[:MAX_TEXT_LENGTH]
+            instruction = """Provide a comprehensive summary of the document above. 
 Include key points, main arguments, and important details. 
 Format the summary with clear sections and bullet points where appropriate.
-
-Document:
-{text[:MAX_TEXT_LENGTH]}
 """
+            response = _generate_with_document(instruction, document, operation, reusable=not tree)
         elif summary_type == "brief":
-            prompt = f"""Provide a brief, concise summary of the following document in 3-5 sentences.
+            if tree:
+                return tree["root"]
+            instruction = """Provide a brief, concise summary of the document above in 3-5 sentences.
 Focus on the most important points only.
-
-Document:
-{text[:MAX_TEXT_LENGTH]}
 """
+            if _provider_caching_available():
+                # The cached document costs less to reuse than a compressed copy
+                response = _generate_with_document(instruction, text[:MAX_TEXT_LENGTH], operation)
+            else:
+                response = _generate_with_document(
+                    instruction, compress_text(text, BRIEF_INPUT_LENGTH), operation, reusable=False
+                )
         else:  # reference-linked
-            prompt = f"""Provide a detailed summary of the following document with references to specific pages.
+            if tree:
+                document = _format_tree_nodes(tree["leaves"])
+                if len(document) > MAX_TEXT_LENGTH:
+                    document = _format_tree_nodes(tree["sections"])
+            else:
+                document = text[:MAX_TEXT_LENGTH]
+            instruction = """Provide a detailed summary of the document above with references to specific pages.
 For each key point, indicate which page(s) it comes from using the format [Page X].
-
-Document:
-{text[:MAX_TEXT_LENGTH]}
 """
+            response = _generate_with_document(instruction, document, operation, reusable=not tree)
         
-        response = model.generate_content(prompt)
         return response.text
     except Exception as e:
         raise Exception(f"Error generating summary: {str(e)}")
@@ -59,39 +627,71 @@ def answer_question(text, question):
         str: Answer or None if error
     """
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
-        prompt = f"""Based on the following document, answer this question: {question}
+        if len(text) > MAX_TEXT_LENGTH:
+            # Walk the summary tree down to the pages relevant to the question
+            tree = get_summary_tree(text, _generate_text)
+            document = select_pages(text, find_relevant_pages(tree, question))[:MAX_TEXT_LENGTH]
+            reusable = False
+        else:
+            document = text
+            reusable = True
+        
+        instruction = f"""Based on the document above, answer this question: {question}
 
 Provide a clear, detailed answer and reference specific parts of the document if possible.
-
-Document:
-{text[:MAX_TEXT_LENGTH]}
 """
-        response = model.generate_content(prompt)
+        response = _generate_with_document(instruction, document, "qa", reusable)
         return response.text
     except Exception as e:
         raise Exception(f"Error answering question: {str(e)}")
 
-def generate_quiz(text, num_questions=5):
+def answer_question_cached(text, question):
+    """
+    Answer a question, reusing the answer to a near-duplicate question on the same document
+    
+    Args:
+        text (str): Document text
+        question (str): User's question
+        
+    Returns:
+        tuple: (answer, cached) where cached is True if no model call was made
+    """
+    document_hash = get_document_hash(text)
+    answer = question_cache.lookup(document_hash, question)
+    if answer is not None:
+        return answer, True
+    
+    answer = answer_question(text, question)
+    if answer:
+        question_cache.store(document_hash, question, answer)
+    return answer, False
+
+def generate_quiz(text, num_questions=5, exclude_questions=None):
     """
     Generate quiz questions from the PDF
     
     Args:
         text (str): Document text
         num_questions (int): Number of questions to generate
+        exclude_questions (list): Question texts that must not be repeated
         
     Returns:
         list: Quiz questions or None if error
     """
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
-        prompt = f"""Based on the following document, create {num_questions} multiple-choice questions to test understanding.
+        exclude = ""
+        if exclude_questions:
+            exclude = "\nDo not repeat any of these existing questions:\n" + "\n".join(
+                f"- {question}" for question in exclude_questions
+            ) + "\n"
+        instruction = f"""Based on the document above, create {num_questions} multiple-choice questions to test understanding.
 
 For each question, provide:
 1. The question
 2. Four options (A, B, C, D)
 3. The correct answer
 4. A brief explanation
+5. The page number the question is based on
 
 Format your response as JSON with this structure:
 [
@@ -99,14 +699,12 @@ Format your response as JSON with this structure:
     "question": "Question text",
     "options": ["A) Option 1", "B) Option 2", "C) Option 3", "D) Option 4"],
     "correct_answer": "A",
-    "explanation": "Explanation text"
+    "explanation": "Explanation text",
+    "page": 1
   }}
 ]
-
-Document:
-{text[:MAX_TEXT_LENGTH]}
-"""
-        response = model.generate_content(prompt)
+{exclude}"""
+        response = _generate_with_document(instruction, text[:MAX_TEXT_LENGTH], "quiz")
         
         # Try to parse JSON from response
         response_text = response.text
@@ -2,27 +2,146 @@
 Configuration file for the PDF Summarizer application
 """
 import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-
-# Load environment variables
-load_dotenv()
 
 # API Configuration
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = "gemini-2.5-flash"
+MODEL_POOL_SIZE = 8
+
+# Model Routing
+# Costs are USD per million tokens; latency is a rough baseline in seconds
+# plus seconds per 1,000 input tokens. Tune from ai_services.get_route_stats().
+MODEL_TIERS = {
+    "lite": {
+        "model": "gemini-2.5-flash-lite",
+        "input_cost": 0.10,
+        "output_cost": 0.40,
+        "base_latency": 1.0,
+        "latency_per_1k_tokens": 0.05
+    },
+    "standard": {
+        "model": GEMINI_MODEL,
+        "input_cost": 0.30,
+        "output_cost": 2.50,
+        "base_latency": 2.0,
+        "latency_per_1k_tokens": 0.10
+    },
+    "pro": {
+        "model": "gemini-2.5-pro",
+        "input_cost": 1.25,
+        "output_cost": 10.00,
+        "base_latency": 6.0,
+        "latency_per_1k_tokens": 0.25
+    }
+}
+TIER_ORDER = ["lite", "standard", "pro"]
+
+# Preferred tier and expected output size per operation
+OPERATION_ROUTES = {
+    "summary:comprehensive": {"tier": "standard", "output_tokens": 1500},
+    "summary:brief": {"tier": "lite", "output_tokens": 200},
+    "summary:reference-linked": {"tier": "standard", "output_tokens": 1500},
+    "qa": {"tier": "standard", "output_tokens": 500},
+    "quiz": {"tier": "standard", "output_tokens": 1200},
+    "tree:leaf": {"tier": "lite", "output_tokens": 300},
+    "tree:section": {"tier": "lite", "output_tokens": 400},
+    "tree:root": {"tier": "lite", "output_tokens": 200},
+    "default": {"tier": "standard", "output_tokens": 500}
+}
+SMALL_INPUT_TOKENS = 3000
+ROUTE_LATENCY_BUDGET = None
+ROUTE_COST_BUDGET = 0.05
+
+# Seconds a caller waits for an identical in-flight model request
+SINGLE_FLIGHT_TIMEOUT = 180
+
+# Document Sessions (documents are registered once and reused across operations)
+DOCUMENT_SESSION_POOL_SIZE = 32
+CONTEXT_CACHE_MIN_TOKENS = 4096
+CONTEXT_CACHE_TTL = 3600
+CACHED_INPUT_COST_RATIO = 0.25
 
 # Text Processing Limits
 MAX_TEXT_LENGTH = 30000
 
+# Uploads larger than this are spooled to disk and memory-mapped
+PDF_SPOOL_THRESHOLD = 20 * 1024 * 1024
+PDF_SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# Extractive Summarization
+EXTRACTIVE_SUMMARY_SENTENCES = 8
+BRIEF_INPUT_LENGTH = 8000
+
+# Question Cache
+QUESTION_CACHE_THRESHOLD = 0.8
+QUESTION_CACHE_WORD_THRESHOLD = 0.6
+QUESTION_CACHE_MAX_ENTRIES = 200
+QUESTION_CACHE_MAX_DOCUMENTS = 100
+QUESTION_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Background Jobs (deadlines in seconds per operation)
+JOB_WORKERS = 16
+JOB_DEADLINES = {
+    "summary": 180,
+    "qa": 90,
+    "quiz": 120
+}
+
+# Persistent Caches
+CACHE_DIR = os.getenv("SUMMAREASE_CACHE_DIR", ".summarease_cache")
+
+# Summary Tree (used for documents longer than MAX_TEXT_LENGTH)
+SUMMARY_TREE_PAGES_PER_LEAF = 5
+SUMMARY_TREE_LEAVES_PER_SECTION = 8
+SUMMARY_TREE_BUILD_WORKERS = 4
+SUMMARY_TREE_MEMORY_SIZE = 32
+
+# Usage Budgets (estimated USD per day; soft budgets warn, hard budgets stop model calls)
+USER_BUDGET_SOFT = 0.50
+USER_BUDGET_HARD = 1.00
+DAILY_BUDGET_SOFT = 20.00
+DAILY_BUDGET_HARD = 50.00
+
+# Quiz Bank
+QUIZ_BANK_BATCH_SIZE = 10
+QUIZ_BANK_LOW_WATERMARK = 10
+QUIZ_BANK_MAX_SIZE = 200
+QUIZ_BANK_MEMORY_SIZE = 64
+
+# Incremental Reprocessing (a revision shares at least this fraction of pages)
+REVISION_MIN_SHARED_PAGES = 0.5
+# Pages with fewer words (blank, scanned or boilerplate) are not used to match revisions
+REVISION_MIN_PAGE_WORDS = 20
+PAGE_STORE_MAX_AGE_SECONDS = 30 * 24 * 3600
+PAGE_STORE_MAX_TOTAL_BYTES = 200 * 1024 * 1024
+PAGE_STORE_GC_INTERVAL = 3600
+
+# Session Snapshots (restore a user's work after a refresh)
+SNAPSHOT_MAX_AGE_SECONDS = 30 * 24 * 3600
+SNAPSHOT_MAX_TOTAL_BYTES = 500 * 1024 * 1024
+SNAPSHOT_GC_INTERVAL = 3600
+
 # App Configuration
 APP_TITLE = "SummarEase - AI PDF Summarizer"
 APP_ICON = "📄"
 LAYOUT = "wide"
 
+_env_loaded = False
+
+def get_gemini_api_key():
+    """Get the Gemini API key, loading the .env file on first use"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+    return os.getenv("GEMINI_API_KEY")
+
 def configure_gemini():
-    """Configure Gemini API with the API key"""
-    if not GEMINI_API_KEY:
-        return False
-    genai.configure(api_key=GEMINI_API_KEY)
-    return True
\ No newline at end of file
+    """
+    Check that the Gemini API key is available
+    
+    The google.generativeai SDK is imported and configured lazily by
+    ai_services when the first model client is created, so startup does
+    not pay for it.
+    """
+    return bool(get_gemini_api_key())
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Local extractive summarization using centroid scoring over sentence vectors
+"""
+import re
+import numpy as np
+from pdf_processor import split_pages
+
+# Header compress_text puts before the sentences of each page
+PAGE_HEADER = "\n\n--- Page {} ---\n\n"
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9'-]{2,}")
+# Shorter leftovers of the budget are not worth a cut-off sentence
+MIN_TRUNCATED_SENTENCE_CHARS = 200
+
+STOP_WORDS = frozenset("""
+the and for are but not you all any can had her was one our out has him his how
+its may new now old see two way who did get let put say she too use that with
+have this will your from they know want been good much some time very when come
+here just like long make many more only over such take than them well were what
+also into most other their there these those which while would could should about
+after again being below between both during each further once same then through
+under until upon where whom why because before above off own nor
+""".split())
+
+def split_sentences(text):
+    """
+    Split document text into sentences, keeping track of their page numbers
+
+    Args:
+        text (str): Document text with page markers
+
+    Returns:
+        list: (sentence, page_number) tuples in document order
+    """
+    sentences = []
+    # Text without page markers is treated as a single unnumbered page
+    pages = split_pages(text) or [(None, text)]
+    for page_num, page_text in pages:
+        page_text = " ".join(page_text.split())
+        if not page_text:
+            continue
+        for sentence in SENTENCE_SPLIT_PATTERN.split(page_text):
+            sentence = sentence.strip()
+            if len(sentence) >= 20:
+                sentences.append((sentence, page_num))
+    return sentences
+
+def score_sentences(sentences):
+    """
+    Score sentences by cosine similarity of their TF-IDF vector to the document centroid
+
+    Args:
+        sentences (list): Sentence strings
+
+    Returns:
+        numpy.ndarray: One salience score per sentence
+    """
+    vocabulary = {}
+    sentence_ids = []
+    term_ids = []
+    for i, sentence in enumerate(sentences):
+        for word in WORD_PATTERN.findall(sentence.lower()):
+            if word not in STOP_WORDS:
+                term_ids.append(vocabulary.setdefault(word, len(vocabulary)))
+                sentence_ids.append(i)
+
+    num_sentences = len(sentences)
+    if not term_ids:
+        return np.zeros(num_sentences)
+
+    # Sparse (sentence, term, count) triples instead of a dense sentence x vocabulary matrix
+    num_terms = len(vocabulary)
+    pair_ids, counts = np.unique(
+        np.array(sentence_ids, dtype=np.int64) * num_terms + np.array(term_ids),
+        return_counts=True
+    )
+    rows = pair_ids // num_terms
+    cols = pair_ids % num_terms
+
+    document_frequency = np.bincount(cols, minlength=num_terms)
+    idf = np.log((1 + num_sentences) / (1 + document_frequency)) + 1.0
+    weights = counts * idf[cols]
+
+    centroid = np.bincount(cols, weights=weights, minlength=num_terms) / num_sentences
+    dot = np.bincount(rows, weights=weights * centroid[cols], minlength=num_sentences)
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=num_sentences))
+    centroid_norm = np.linalg.norm(centroid)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = dot / (norms * centroid_norm)
+    return np.nan_to_num(scores)
+
+def select_sentences(text, max_sentences=None, max_chars=None, count_page_headers=False):
+    """
+    Select the most salient sentences across the whole document
+
+    Args:
+        text (str): Document text with page markers
+        max_sentences (int): Maximum number of sentences to keep
+        max_chars (int): Maximum combined length of the selected sentences
+        count_page_headers (bool): Also count a PAGE_HEADER for each selected
+            page against max_chars
+
+    Returns:
+        list: Selected (sentence, page_number) tuples in document order
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+
+    scores = score_sentences([sentence for sentence, _ in sentences])
+    selected = []
+    truncated = {}
+    selected_pages = set()
+    total_chars = 0
+    for index in np.argsort(-scores, kind="stable"):
+        if max_sentences is not None and len(selected) >= max_sentences:
+            break
+        page_num = sentences[index][1]
+        header = 0
+        if count_page_headers and page_num is not None and page_num not in selected_pages:
+            header = len(PAGE_HEADER.format(page_num))
+        length = header + len(sentences[index][0]) + 1
+        if max_chars is not None and total_chars + length > max_chars:
+            remaining = max_chars - total_chars - header - 1
+            if remaining < MIN_TRUNCATED_SENTENCE_CHARS:
+                continue
+            # Long runs without sentence breaks (tables, slides, lists) are cut, not dropped
+            truncated[index] = sentences[index][0][:remaining]
+            length = header + remaining + 1
+        selected.append(index)
+        selected_pages.add(page_num)
+        total_chars += length
+
+    return [(truncated.get(i, sentences[i][0]), sentences[i][1]) for i in sorted(selected)]
+
+def extractive_summary(text, num_sentences=8):
+    """
+    Build a zero-cost summary from the most salient sentences
+
+    Args:
+        text (str): Document text with page markers
+        num_sentences (int): Number of sentences in the summary
+
+    Returns:
+        str: Bullet list of key sentences with page references
+    """
+    selected = select_sentences(text, max_sentences=num_sentences)
+    lines = []
+    for sentence, page_num in selected:
+        reference = f" [Page {page_num}]" if page_num else ""
+        lines.append(f"- {sentence}{reference}")
+    return "\n".join(lines)
+
+def compress_text(text, max_chars):
+    """
+    Compress document text to the most salient sentences before sending it to the model
+
+    Args:
+        text (str): Document text with page markers
+        max_chars (int): Target length of the compressed text
+
+    Returns:
+        str: Original text if it already fits, otherwise the selected sentences
+            grouped under their page markers
+    """
+    if len(text) <= max_chars:
+        return text
+
+    compressed = ""
+    current_page = None
+    for sentence, page_num in select_sentences(text, max_chars=max_chars, count_page_headers=True):
+        if page_num is not None and page_num != current_page:
+            current_page = page_num
+            compressed += PAGE_HEADER.format(page_num)
+        compressed += sentence + " "
+    compressed = compressed.strip()
+    if not compressed:
+        return text[:max_chars]
+    return compressed
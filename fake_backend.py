@@ -0,0 +1,97 @@
+"""
+Offline fake Gemini model for load tests and local development
+"""
+import itertools
+import json
+import re
+import time
+from types import SimpleNamespace
+
+_question_ids = itertools.count(1)
+
+class FakeModel:
+    """
+    Drop-in stand-in for genai.GenerativeModel that never calls the network
+
+    Quiz prompts get valid quiz JSON with the requested number of questions;
+    every other prompt gets a short canned answer. An optional latency
+    simulates the model round trip. A cached context stands in for a
+    provider-side context cache and is reported as cached prompt tokens.
+    """
+
+    def __init__(self, model_name="fake-model", generation_config=None, latency=0.0, cached_context=""):
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.latency = latency
+        self.cached_context = cached_context
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        match = re.search(r"create (\d+) multiple-choice questions", prompt)
+        if match:
+            text = json.dumps(fake_quiz(int(match.group(1))))
+        else:
+            text = f"Fake response from {self.model_name} for a {len(prompt)}-character prompt."
+
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=(len(self.cached_context) + len(prompt)) // 4,
+                cached_content_token_count=len(self.cached_context) // 4,
+                candidates_token_count=len(text) // 4,
+                total_token_count=(len(self.cached_context) + len(prompt) + len(text)) // 4
+            )
+        )
+
+def fake_quiz(num_questions):
+    """
+    Build unique placeholder quiz questions in the format generate_quiz returns
+
+    Args:
+        num_questions (int): Number of questions
+
+    Returns:
+        list: Quiz question dictionaries
+    """
+    return [
+        {
+            "question": f"Fake question {next(_question_ids)}?",
+            "options": ["A) First", "B) Second", "C) Third", "D) Fourth"],
+            "correct_answer": "A",
+            "explanation": "Fake explanation.",
+            "page": 1
+        }
+        for _ in range(num_questions)
+    ]
+
+def fake_model_factory(latency=0.0):
+    """
+    Create a factory for ai_services.set_model_factory
+
+    Args:
+        latency (float): Simulated seconds per model call
+
+    Returns:
+        callable: (model_name, generation_config) -> FakeModel
+    """
+    def factory(model_name, generation_config=None):
+        return FakeModel(model_name, generation_config, latency)
+    return factory
+
+def fake_context_cache_factory(latency=0.0):
+    """
+    Create a factory for ai_services.set_context_cache
+
+    Args:
+        latency (float): Simulated seconds per model call
+
+    Returns:
+        callable: (model_name, document, ttl_seconds) -> FakeModel bound to the document
+    """
+    def factory(model_name, document, ttl_seconds):
+        return FakeModel(model_name, latency=latency, cached_context=f"Document:\n{document}")
+    return factory
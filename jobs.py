@@ -0,0 +1,173 @@
+"""
+Cancellable, deadline-bound background jobs for model work
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from config import JOB_WORKERS
+
+class JobCancelled(Exception):
+    """Raised inside a job that was cancelled or superseded"""
+
+class JobTimeout(Exception):
+    """Raised when a job does not finish before its deadline"""
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="model-job")
+_current_job = contextvars.ContextVar("current_job", default=None)
+_active_jobs = {}
+_active_jobs_lock = threading.Lock()
+_stats = {"submitted": 0, "completed": 0, "cancelled": 0, "timed_out": 0}
+
+class Job:
+    """A unit of model work for one session and widget"""
+
+    def __init__(self, key, deadline=None):
+        self.key = key
+        self.submitted = time.monotonic()
+        self.timeout = deadline
+        # Set when a worker picks the job up, so time spent queued does not count
+        self.deadline = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    def start(self):
+        """Start the deadline clock; called by the worker running the job"""
+        if self.timeout:
+            self.deadline = time.monotonic() + self.timeout
+
+    def cancel(self, reason="cancelled"):
+        """
+        Cancel the job; a job already calling the model stops before its next call
+
+        Args:
+            reason (str): Statistic to count the job under, "cancelled" or "timed_out"
+        """
+        if not self._cancel_event.is_set():
+            self._cancel_event.set()
+            self.future.cancel()
+            with _active_jobs_lock:
+                _stats[reason] += 1
+                if _active_jobs.get(self.key) is self:
+                    del _active_jobs[self.key]
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def is_expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+def check_cancelled():
+    """
+    Stop the current job if it was cancelled or ran past its deadline
+
+    Called before each model call. Does nothing outside of a job.
+    """
+    job = _current_job.get()
+    if job is None:
+        return
+    if job.is_cancelled():
+        raise JobCancelled("Job was cancelled")
+    if job.is_expired():
+        raise JobTimeout("Job ran past its deadline")
+
+def _run(job, fn, args, kwargs):
+    _current_job.set(job)
+    job.start()
+    check_cancelled()
+    return fn(*args, **kwargs)
+
+def submit_job(session_id, widget, fn, *args, deadline=None, **kwargs):
+    """
+    Run fn in the background, cancelling the previous job for the same session and widget
+
+    Args:
+        session_id (str): Streamlit session id
+        widget (str): Widget or operation the job belongs to
+        fn (callable): Work to run
+        deadline (float): Seconds the job may run once a worker starts it, or
+            None for no deadline
+
+    Returns:
+        Job: The submitted job
+    """
+    key = (session_id, widget)
+    job = Job(key, deadline)
+    with _active_jobs_lock:
+        previous = _active_jobs.get(key)
+        _active_jobs[key] = job
+        _stats["submitted"] += 1
+    if previous is not None:
+        previous.cancel()
+
+    # Each job runs in a copy of the caller's context
+    job.future = _executor.submit(contextvars.copy_context().run, _run, job, fn, args, kwargs)
+    return job
+
+def cancel_session_jobs(session_id):
+    """
+    Cancel every running job of a session, e.g. when it uploads another file
+
+    Args:
+        session_id (str): Streamlit session id
+    """
+    with _active_jobs_lock:
+        jobs = [job for key, job in _active_jobs.items() if key[0] == session_id]
+    for job in jobs:
+        job.cancel()
+
+def wait_for_job(job, on_tick=None, poll_interval=0.5):
+    """
+    Wait for a job's result, enforcing its deadline
+
+    Args:
+        job (Job): Job returned by submit_job
+        on_tick (callable): Called with the seconds since submission while waiting
+        poll_interval (float): Seconds between on_tick calls
+
+    Returns:
+        Result of the job's function
+    """
+    try:
+        while True:
+            timeout = poll_interval
+            if job.deadline is not None:
+                timeout = min(timeout, max(0.0, job.deadline - time.monotonic()))
+            try:
+                result = job.future.result(timeout=timeout)
+                break
+            except FutureTimeoutError:
+                if job.future.done():
+                    # The job itself raised a TimeoutError
+                    raise
+                if job.is_expired():
+                    job.cancel("timed_out")
+                    raise JobTimeout(f"Timed out after {job.timeout:.0f} seconds. Please try again.")
+                if on_tick is not None:
+                    on_tick(time.monotonic() - job.submitted)
+            except Exception as e:
+                # Futures cancelled before they started raise CancelledError
+                if job.is_cancelled() and not isinstance(e, (JobCancelled, JobTimeout)):
+                    raise JobCancelled("Job was cancelled") from e
+                raise
+    finally:
+        with _active_jobs_lock:
+            if _active_jobs.get(job.key) is job:
+                del _active_jobs[job.key]
+
+    if job.is_cancelled():
+        # Superseded while the model call was already running; discard the result
+        raise JobCancelled("Job was cancelled")
+    with _active_jobs_lock:
+        _stats["completed"] += 1
+    return result
+
+def get_job_stats():
+    """
+    Job statistics
+
+    Returns:
+        dict: Submitted, completed, cancelled, timed out and running job counts
+    """
+    with _active_jobs_lock:
+        return dict(_stats, running=len(_active_jobs))
@@ -0,0 +1,344 @@
+"""
+Concurrent-session load test for the Streamlit app
+
+Drives simulated sessions through main.py and the ui_components render
+functions with Streamlit's headless AppTest runner and an offline fake
+model. Each session uploads a PDF, generates a summary, asks questions and
+takes a quiz. Concurrency is stepped up until throughput saturates.
+
+By default every session uploads its own PDF, so summaries, answers and
+quizzes are generated rather than served from the shared caches; use
+--cache-mode warm to measure cache hits instead. All caches, the usage
+ledger and session snapshots go to a temporary directory.
+
+Run with:
+    python load_test.py --levels 1 2 4 8 16 --model-latency 0.5
+"""
+import argparse
+import io
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep fake calls, quiz banks and snapshots out of the real cache; this must
+# happen before any project module reads the config
+if "SUMMAREASE_LOAD_TEST_CACHE_DIR" not in os.environ:
+    os.environ["SUMMAREASE_LOAD_TEST_CACHE_DIR"] = tempfile.mkdtemp(prefix="summarease-load-test-")
+os.environ["SUMMAREASE_CACHE_DIR"] = os.environ["SUMMAREASE_LOAD_TEST_CACHE_DIR"]
+
+from pdf_processor import get_rss_bytes
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+SAMPLE_QUESTIONS = [
+    "What is the main topic of the document?",
+    "Which methods are described?",
+    "What are the key conclusions?"
+]
+
+# Runs inside every simulated session: swap the uploader for the sample PDF,
+# then execute the real app script.
+DRIVER_SCRIPT = f"""
+import runpy
+import streamlit as st
+import load_test
+
+st.file_uploader = load_test.fake_file_uploader
+runpy.run_path({MAIN_SCRIPT!r}, run_name="__main__")
+"""
+
+_sample_pdf = None
+_sample_pages = 20
+_cold = True
+_variants = itertools.count(1)
+_driver_path = None
+
+def build_sample_pdf(num_pages=20, lines_per_page=30, variant=0):
+    """
+    Build a small text PDF without any PDF-writing dependency
+
+    Args:
+        num_pages (int): Number of pages
+        lines_per_page (int): Text lines per page
+        variant (int): Number written into every line, so variants have
+            different content
+
+    Returns:
+        bytes: PDF file content
+    """
+    objects = []
+    page_ids = []
+    font_id = 3
+    next_id = 4
+    for page_num in range(num_pages):
+        lines = [
+            f"Page {page_num + 1} line {line + 1}: study {variant} describes training methods, "
+            f"evaluation results and key conclusions."
+            for line in range(lines_per_page)
+        ]
+        stream = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        objects.append((content_id, f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"))
+        objects.append((page_id, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                                 f"/Resources << /Font << /F1 {font_id} 0 R >> >> "
+                                 f"/Contents {content_id} 0 R >>"))
+        page_ids.append(page_id)
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.append((1, "<< /Type /Catalog /Pages 2 0 R >>"))
+    objects.append((2, f"<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>"))
+    objects.append((font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"))
+    objects.sort()
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id, body in objects:
+        offsets[object_id] = output.tell()
+        output.write(f"{object_id} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref_offset = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for object_id in range(1, len(objects) + 1):
+        output.write(f"{offsets[object_id]:010d} 00000 n \n".encode())
+    output.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+                 f"startxref\n{xref_offset}\n%%EOF\n".encode())
+    return output.getvalue()
+
+def fake_file_uploader(*args, **kwargs):
+    """
+    Stand-in for st.file_uploader
+
+    In cold mode each session gets its own PDF variant, built on its first
+    run and kept in its session state so reruns upload the same file. In
+    warm mode every session uploads the shared sample PDF.
+    """
+    import streamlit as st
+
+    if _cold:
+        if "load_test_pdf" not in st.session_state:
+            st.session_state.load_test_pdf = build_sample_pdf(_sample_pages, variant=next(_variants))
+        pdf = st.session_state.load_test_pdf
+    else:
+        pdf = _sample_pdf
+    upload = io.BytesIO(pdf)
+    upload.name = "load_test.pdf"
+    upload.size = len(pdf)
+    return upload
+
+def install_shared_runtime():
+    """
+    Give all simulated sessions one mock Streamlit runtime
+
+    AppTest installs a fresh mock runtime for each run and clears it
+    afterwards, so concurrent runs in one process would tear down each
+    other's runtime. Pinning a single shared runtime makes the sessions
+    behave like tabs connected to one server.
+    """
+    from unittest.mock import MagicMock
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    shared_runtime = MagicMock(spec=Runtime)
+    shared_runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared_runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: shared_runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+def get_driver_path():
+    """
+    Write the driver script to a file shared by all sessions
+
+    Streamlit caches the app's page list process-wide, so every session must
+    run the same script path or concurrent runs resolve each other's pages.
+    """
+    global _driver_path
+    if _driver_path is None:
+        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+            f.write(DRIVER_SCRIPT)
+        _driver_path = f.name
+    return _driver_path
+
+def _click(app, label, timeout):
+    """Click the first button with the given label and rerun the script"""
+    for button in app.button:
+        if button.label == label:
+            start = time.perf_counter()
+            button.click().run(timeout=timeout)
+            return time.perf_counter() - start
+    raise RuntimeError(f"Button not found: {label}")
+
+def run_session(timeout=30):
+    """
+    Drive one session through upload, summary, Q&A and quiz
+
+    Args:
+        timeout (float): Per-rerun timeout in seconds
+
+    Returns:
+        dict: Rerun latencies in seconds, the AppTest (kept alive for memory
+            measurement) and an error message if the session failed
+    """
+    from streamlit.testing.v1 import AppTest
+
+    latencies = []
+    app = AppTest.from_file(get_driver_path(), default_timeout=timeout)
+    try:
+        start = time.perf_counter()
+        app.run()
+        latencies.append(time.perf_counter() - start)
+
+        latencies.append(_click(app, "Generate Summary", timeout))
+        for question in SAMPLE_QUESTIONS:
+            app.text_input[0].input(question)
+            latencies.append(_click(app, "Get Answer", timeout))
+        latencies.append(_click(app, "Generate Quiz", timeout))
+        latencies.append(_click(app, "Submit Quiz", timeout))
+
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        return {"latencies": latencies, "app": app, "error": None}
+    except Exception as e:
+        return {"latencies": latencies, "app": app, "error": str(e)}
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def run_level(concurrency, sessions_per_worker=1, timeout=30):
+    """
+    Run concurrent sessions and measure latency, throughput and memory
+
+    Args:
+        concurrency (int): Number of simultaneous sessions
+        sessions_per_worker (int): Sessions run back to back by each worker
+        timeout (float): Per-rerun timeout in seconds
+
+    Returns:
+        dict: Metrics for this concurrency level
+    """
+    total_sessions = concurrency * sessions_per_worker
+    rss_before = get_rss_bytes()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: run_session(timeout), range(total_sessions)))
+    elapsed = time.perf_counter() - start
+    rss_after = get_rss_bytes()
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    errors = [result["error"] for result in results if result["error"]]
+    # Sessions stay referenced in results until here, so the RSS delta includes them
+    del results
+
+    return {
+        "concurrency": concurrency,
+        "sessions": total_sessions,
+        "reruns": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "memory_per_session": max(0, rss_after - rss_before) / total_sessions
+    }
+
+def find_saturation(levels, min_gain=0.10):
+    """
+    Find the concurrency level where throughput stops growing
+
+    Args:
+        levels (list): run_level results in increasing concurrency order
+        min_gain (float): Minimum relative throughput gain to count as scaling
+
+    Returns:
+        int: Concurrency at which throughput saturates, or None if it kept scaling
+    """
+    for previous, current in zip(levels, levels[1:]):
+        if current["throughput"] < previous["throughput"] * (1 + min_gain):
+            return previous["concurrency"]
+    return None
+
+def format_report(levels, cache_mode="cold"):
+    """
+    Format load test results as text
+
+    Args:
+        levels (list): run_level results
+        cache_mode (str): "cold" if every session uploaded its own PDF
+
+    Returns:
+        str: Report text
+    """
+    lines = [
+        f"Load Test Report ({cache_mode} caches)",
+        "=" * 78,
+        f"{'sessions':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'MB/session':>11} {'errors':>7}"
+    ]
+    for level in levels:
+        lines.append(
+            f"{level['concurrency']:>8} {level['throughput']:>9.1f} "
+            f"{level['p50'] * 1000:>8.0f} {level['p95'] * 1000:>8.0f} {level['p99'] * 1000:>8.0f} "
+            f"{level['memory_per_session'] / 2**20:>11.1f} {len(level['errors']):>7}"
+        )
+    saturation = find_saturation(levels)
+    lines.append("")
+    if saturation is None:
+        lines.append("Throughput still scaling at the highest concurrency tested")
+    else:
+        lines.append(f"Throughput saturates at about {saturation} concurrent sessions")
+    for level in levels:
+        for error in sorted(set(level["errors"])):
+            lines.append(f"Error at {level['concurrency']} sessions: {error}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the SummarEase Streamlit app")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="Concurrent session counts to test")
+    parser.add_argument("--sessions-per-worker", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=20, help="Pages in the sample PDF")
+    parser.add_argument("--model-latency", type=float, default=0.2,
+                        help="Simulated seconds per model call")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-rerun timeout in seconds")
+    parser.add_argument("--cache-mode", choices=["cold", "warm"], default="cold",
+                        help="cold: a different PDF per session; warm: the same PDF for all sessions")
+    args = parser.parse_args()
+
+    import ai_services
+    import load_test
+    from fake_backend import fake_model_factory
+
+    os.environ.setdefault("GEMINI_API_KEY", "offline-load-test")
+    ai_services.set_model_factory(fake_model_factory(args.model_latency))
+    # The driver script imports this file as load_test, not __main__
+    load_test._sample_pdf = build_sample_pdf(args.pages, variant=0)
+    load_test._sample_pages = args.pages
+    load_test._cold = args.cache_mode == "cold"
+    install_shared_runtime()
+
+    try:
+        # Warm up imports so the first level does not pay for them
+        run_session(args.timeout)
+
+        levels = [
+            run_level(concurrency, args.sessions_per_worker, args.timeout)
+            for concurrency in args.levels
+        ]
+        print(format_report(levels, args.cache_mode))
+    finally:
+        if _driver_path is not None:
+            os.remove(_driver_path)
+        shutil.rmtree(os.environ["SUMMAREASE_CACHE_DIR"], ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,18 @@ import streamlit as st
 
 # Import custom modules
 from config import APP_TITLE, APP_ICON, LAYOUT, configure_gemini
-from pdf_processor import extract_text_from_pdf
+from pdf_processor import process_pdf, get_document_hash, get_file_hash
+from session_snapshots import find_snapshot, save_snapshot
+from usage_ledger import set_usage_context
 from ui_components import (
+    get_session_id,
+    get_user_id,
+    restore_session_state,
+    render_snapshot_restore,
     render_sidebar,
     render_landing_page,
+    render_section_selector,
+    render_budget_status,
     render_summary_tab,
     render_qa_tab,
     render_quiz_tab,
@@ -40,6 +48,12 @@ def init_session_state():
         st.session_state.qa_history = []
     if 'quiz' not in st.session_state:
         st.session_state.quiz = []
+    if 'sections' not in st.session_state:
+        st.session_state.sections = []
+    if 'pdf_info' not in st.session_state:
+        st.session_state.pdf_info = {}
+    if 'document_hash' not in st.session_state:
+        st.session_state.document_hash = ""
 
 init_session_state()
 
@@ -54,16 +68,43 @@ st.markdown("Upload a PDF document to get started with AI-powered analysis")
 uploaded_file = st.file_uploader("Choose a PDF file", type="pdf")
 
 # Main content
-if uploaded_file is not None:
+if uploaded_file is not None or st.session_state.get("resumed"):
+    # A different file replaces the current document and cancels its model jobs
+    upload_key = (uploaded_file.name, uploaded_file.size) if uploaded_file is not None else None
+    if uploaded_file is not None and st.session_state.get("upload_key") != upload_key:
+        if "upload_key" in st.session_state:
+            from jobs import cancel_session_jobs
+            cancel_session_jobs(get_session_id())
+        st.session_state.upload_key = upload_key
+        st.session_state.resumed = False
+        st.session_state.file_hash = get_file_hash(uploaded_file)
+        st.session_state.file_name = uploaded_file.name
+        # A file this user worked on before is restored without extraction or model calls
+        restore_session_state(find_snapshot(get_user_id(), st.session_state.file_hash) or {})
+    
     # Extract text from PDF
     if not st.session_state.pdf_text:
         with st.spinner("Extracting text from PDF..."):
             try:
-                st.session_state.pdf_text = extract_text_from_pdf(uploaded_file)
+                processed = process_pdf(uploaded_file, owner=get_user_id())
+                st.session_state.pdf_text = processed["text"]
+                st.session_state.sections = processed["sections"]
+                st.session_state.pdf_info = processed["info"]
+                st.session_state.document_hash = get_document_hash(processed["text"])
             except Exception as e:
                 st.error(str(e))
                 st.stop()
     
+    # Attribute this run's model calls in the usage ledger
+    set_usage_context(get_session_id(), st.session_state.document_hash, get_user_id())
+    render_budget_status()
+    
+    # Summary, Q&A and quiz can be scoped to one section
+    document_text = render_section_selector(
+        st.session_state.pdf_text,
+        st.session_state.sections
+    )
+    
     # Create tabs for different features
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "📝 Summary", 
@@ -75,23 +116,30 @@ if uploaded_file is not None:
     
     # Render each tab
     with tab1:
-        render_summary_tab(st.session_state.pdf_text)
+        render_summary_tab(document_text)
     
     with tab2:
-        render_qa_tab(st.session_state.pdf_text)
+        render_qa_tab(document_text)
     
     with tab3:
-        render_quiz_tab(st.session_state.pdf_text)
+        render_quiz_tab(document_text)
     
     with tab4:
         render_pdf_viewer_tab(st.session_state.pdf_text, uploaded_file)
     
     with tab5:
         render_export_tab()
+    
+    # Keep a snapshot so a refresh can restore this work
+    try:
+        save_snapshot(get_user_id(), st.session_state.file_hash, st.session_state.file_name, st.session_state)
+    except OSError:
+        pass
 
 else:
     # Landing page
     render_landing_page()
+    render_snapshot_restore()
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,285 @@
+"""
+Per-page text store keyed by page fingerprints, used to reprocess revised PDFs incrementally
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from config import (
+    CACHE_DIR,
+    REVISION_MIN_SHARED_PAGES,
+    REVISION_MIN_PAGE_WORDS,
+    PAGE_STORE_MAX_AGE_SECONDS,
+    PAGE_STORE_MAX_TOTAL_BYTES,
+    PAGE_STORE_GC_INTERVAL
+)
+
+PAGE_STORE_PATH = os.path.join(CACHE_DIR, "pages.sqlite3")
+
+_connection = None
+_lock = threading.Lock()
+_last_gc = {"time": 0.0}
+
+def _get_connection():
+    """Open the page store on first use; call with _lock held"""
+    global _connection
+    if _connection is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _connection = sqlite3.connect(PAGE_STORE_PATH, check_same_thread=False)
+        # Page text is only ever reused for the user who uploaded it
+        _connection.execute("""
+            CREATE TABLE IF NOT EXISTS page_texts (
+                owner TEXT,
+                fingerprint TEXT,
+                text TEXT,
+                last_used REAL,
+                PRIMARY KEY (owner, fingerprint)
+            )
+        """)
+        # Content hashes only, used to find the previous revision among a user's
+        # uploads; blank and boilerplate pages are stored but not matched on
+        _connection.execute("""
+            CREATE TABLE IF NOT EXISTS document_page_hashes (
+                owner TEXT,
+                document_hash TEXT,
+                page INTEGER,
+                text_hash TEXT,
+                distinctive INTEGER,
+                last_used REAL,
+                PRIMARY KEY (owner, document_hash, page)
+            )
+        """)
+        # Revisions found when a document was uploaded, for the shared
+        # per-document artifacts (summary trees, quiz banks)
+        _connection.execute("""
+            CREATE TABLE IF NOT EXISTS revisions (
+                document_hash TEXT PRIMARY KEY,
+                previous_hash TEXT,
+                last_used REAL
+            )
+        """)
+        _connection.execute("CREATE INDEX IF NOT EXISTS page_texts_used ON page_texts (last_used)")
+        _connection.execute(
+            "CREATE INDEX IF NOT EXISTS document_page_hashes_text ON document_page_hashes (owner, text_hash)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS document_page_hashes_used ON document_page_hashes (last_used)")
+        _connection.execute("CREATE INDEX IF NOT EXISTS revisions_used ON revisions (last_used)")
+        _connection.commit()
+    return _connection
+
+def get_page_texts(owner, fingerprints):
+    """
+    Look up page text the same owner already had extracted
+
+    Args:
+        owner (str): User who uploaded the pages
+        fingerprints (list): Page fingerprints
+
+    Returns:
+        dict: Fingerprint -> page text for the pages that are known
+    """
+    fingerprints = list(set(fingerprints))
+    texts = {}
+    with _lock:
+        connection = _get_connection()
+        # Stay under SQLite's bound parameter limit
+        for i in range(0, len(fingerprints), 500):
+            batch = fingerprints[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = connection.execute(
+                f"SELECT fingerprint, text FROM page_texts WHERE owner = ? AND fingerprint IN ({placeholders})",
+                [owner] + batch
+            ).fetchall()
+            texts.update(rows)
+            connection.execute(
+                f"UPDATE page_texts SET last_used = ? WHERE owner = ? AND fingerprint IN ({placeholders})",
+                [time.time(), owner] + batch
+            )
+        connection.commit()
+    return texts
+
+def store_pages(owner, document_hash, pages, page_hashes):
+    """
+    Remember a user's document pages for later revisions
+
+    Pages with fewer than REVISION_MIN_PAGE_WORDS words, and pages repeated
+    within the document, are not used to match revisions: blank pages and
+    boilerplate would make unrelated documents look alike.
+
+    Args:
+        owner (str): User who uploaded the document, or None to store nothing
+        document_hash (str): Content hash of the document text
+        pages (list): (page_number, fingerprint, page_text) tuples; pages
+            without a fingerprint are not stored
+        page_hashes (dict): Page number -> content hash of the page text
+    """
+    if owner is None:
+        return
+    word_counts = {page_num: len(page_text.split()) for page_num, _, page_text in pages}
+    hash_counts = Counter(page_hashes.values())
+    now = time.time()
+    with _lock:
+        connection = _get_connection()
+        connection.executemany(
+            "INSERT OR REPLACE INTO page_texts VALUES (?, ?, ?, ?)",
+            [(owner, fingerprint, page_text, now) for _, fingerprint, page_text in pages if fingerprint]
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO document_page_hashes VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (owner, document_hash, page_num, text_hash,
+                 word_counts.get(page_num, 0) >= REVISION_MIN_PAGE_WORDS and hash_counts[text_hash] == 1, now)
+                for page_num, text_hash in page_hashes.items()
+            ]
+        )
+        connection.commit()
+
+    if time.time() - _last_gc["time"] > PAGE_STORE_GC_INTERVAL:
+        collect_garbage()
+
+def delete_owner_pages(owner):
+    """
+    Delete all page text and page hashes stored for a user
+
+    Args:
+        owner (str): User who uploaded the pages
+    """
+    with _lock:
+        connection = _get_connection()
+        connection.execute("DELETE FROM page_texts WHERE owner = ?", (owner,))
+        connection.execute("DELETE FROM document_page_hashes WHERE owner = ?", (owner,))
+        connection.commit()
+
+def get_document_page_hashes(owner, document_hash):
+    """
+    Page content hashes of a document a user stored
+
+    Args:
+        owner (str): User who uploaded the document
+        document_hash (str): Content hash of the document text
+
+    Returns:
+        dict: Page number -> content hash of the page text
+    """
+    with _lock:
+        rows = _get_connection().execute(
+            "SELECT page, text_hash FROM document_page_hashes WHERE owner = ? AND document_hash = ?",
+            (owner, document_hash)
+        ).fetchall()
+    return dict(rows)
+
+def find_previous_revision(owner, document_hash):
+    """
+    Find the document of the same user sharing the most distinctive pages with this one
+
+    A match is recorded for get_previous_revision.
+
+    Args:
+        owner (str): User who uploaded the document, or None
+        document_hash (str): Content hash of the document text, stored with store_pages
+
+    Returns:
+        str: Document hash of the previous revision, or None if no other
+            upload of the user shares at least REVISION_MIN_SHARED_PAGES of
+            the distinctive pages
+    """
+    if owner is None:
+        return None
+    with _lock:
+        connection = _get_connection()
+        page_count = connection.execute(
+            "SELECT COUNT(*) FROM document_page_hashes WHERE owner = ? AND document_hash = ? AND distinctive",
+            (owner, document_hash)
+        ).fetchone()[0]
+        # Distinctive hashes are unique within a document, so the join stays
+        # within the pages the user's documents have in common
+        row = connection.execute("""
+            SELECT other.document_hash, COUNT(*) AS shared
+            FROM document_page_hashes AS current
+            JOIN document_page_hashes AS other
+              ON other.owner = current.owner AND other.text_hash = current.text_hash
+             AND other.document_hash != current.document_hash AND other.distinctive
+            WHERE current.owner = ? AND current.document_hash = ? AND current.distinctive
+            GROUP BY other.document_hash
+            ORDER BY shared DESC
+            LIMIT 1
+        """, (owner, document_hash)).fetchone()
+        if not page_count or row is None or row[1] < page_count * REVISION_MIN_SHARED_PAGES:
+            return None
+        connection.execute(
+            "INSERT OR REPLACE INTO revisions VALUES (?, ?, ?)", (document_hash, row[0], time.time())
+        )
+        connection.commit()
+    return row[0]
+
+def get_previous_revision(document_hash):
+    """
+    Previous revision recorded by find_previous_revision when the document was uploaded
+
+    Only page content hashes are compared when reusing the previous
+    revision's artifacts, so callers only reuse work on pages whose text
+    they already hold.
+
+    Args:
+        document_hash (str): Content hash of the document text
+
+    Returns:
+        str: Document hash of the previous revision, or None
+    """
+    with _lock:
+        row = _get_connection().execute(
+            "SELECT previous_hash FROM revisions WHERE document_hash = ?", (document_hash,)
+        ).fetchone()
+    return row[0] if row else None
+
+def diff_pages(old_hashes, new_hashes):
+    """
+    Pages of a revision whose content differs from the previous version
+
+    Args:
+        old_hashes (dict): Page number -> content hash of the previous version
+        new_hashes (dict): Page number -> content hash of the revision
+
+    Returns:
+        list: Changed or added page numbers of the revision
+    """
+    return sorted(page_num for page_num, text_hash in new_hashes.items() if old_hashes.get(page_num) != text_hash)
+
+def collect_garbage(max_age=PAGE_STORE_MAX_AGE_SECONDS, max_total_bytes=PAGE_STORE_MAX_TOTAL_BYTES):
+    """
+    Delete pages unused for max_age, then the least recently used page text until under max_total_bytes
+
+    Args:
+        max_age (float): Maximum time since a page was last stored or reused, in seconds
+        max_total_bytes (int): Maximum total size of stored page text
+
+    Returns:
+        int: Number of page texts deleted
+    """
+    cutoff = time.time() - max_age
+    with _lock:
+        _last_gc["time"] = time.time()
+        connection = _get_connection()
+        deleted = connection.execute("DELETE FROM page_texts WHERE last_used < ?", (cutoff,)).rowcount
+        connection.execute("DELETE FROM document_page_hashes WHERE last_used < ?", (cutoff,))
+        connection.execute("DELETE FROM revisions WHERE last_used < ?", (cutoff,))
+
+        total_bytes = connection.execute("SELECT COALESCE(SUM(LENGTH(text)), 0) FROM page_texts").fetchone()[0]
+        if total_bytes > max_total_bytes:
+            # Find the last_used time above which the newest pages fit in the budget
+            kept_bytes = 0
+            threshold = None
+            for last_used, size in connection.execute(
+                "SELECT last_used, LENGTH(text) FROM page_texts ORDER BY last_used DESC"
+            ):
+                kept_bytes += size
+                if kept_bytes > max_total_bytes:
+                    threshold = last_used
+                    break
+            if threshold is not None:
+                deleted += connection.execute(
+                    "DELETE FROM page_texts WHERE last_used <= ?", (threshold,)
+                ).rowcount
+        connection.commit()
+    return deleted
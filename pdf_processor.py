@@ -1,7 +1,166 @@
 """
 PDF processing utilities
 """
-import PyPDF2
+import contextlib
+import hashlib
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from config import PDF_SPOOL_THRESHOLD, PDF_SPOOL_CHUNK_SIZE
+import page_store
+
+PAGE_MARKER_PATTERN = re.compile(r"--- Page (\d+) ---")
+# "Chapter 3 ...", "Part IV ..." or a numbered title such as "2. Related Work";
+# only the keyword is case-insensitive
+HEADING_PATTERN = re.compile(
+    r"^(?:(?i:chapter|part|section)\s+(?:\d+|[IVXLC]+)\b.*|\d{1,2}\.?\s+[A-Z][^.]{2,60}(?<!\d))$"
+)
+# A heading line found on more pages than this is a running header
+MAX_HEADING_REPEATS = 2
+
+def get_rss_bytes():
+    """Current resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # Peak RSS in KiB on Linux; the best available without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _file_size(pdf_file):
+    size = getattr(pdf_file, "size", None)
+    if size is None:
+        position = pdf_file.tell()
+        pdf_file.seek(0, os.SEEK_END)
+        size = pdf_file.tell()
+        pdf_file.seek(position)
+    return size
+
+@contextlib.contextmanager
+def open_pdf_reader(pdf_file):
+    """
+    Open a PdfReader, spooling large uploads to a memory-mapped temporary file
+    
+    Uploads above PDF_SPOOL_THRESHOLD are copied to disk in chunks and parsed
+    through a read-only memory map, so the reader pulls pages from the OS page
+    cache instead of keeping another copy of the file in the Python heap.
+    
+    Args:
+        pdf_file: Uploaded PDF file object
+        
+    Yields:
+        PdfReader: Reader that is valid until the context exits
+    """
+    import PyPDF2
+    
+    pdf_file.seek(0)
+    if _file_size(pdf_file) <= PDF_SPOOL_THRESHOLD:
+        yield PyPDF2.PdfReader(pdf_file)
+        return
+    
+    with tempfile.TemporaryFile(prefix="summarease-", suffix=".pdf") as spool:
+        shutil.copyfileobj(pdf_file, spool, PDF_SPOOL_CHUNK_SIZE)
+        spool.flush()
+        with mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PyPDF2.PdfReader(mapped)
+
+def _extract_pages(pdf_reader, on_page=None):
+    parts = []
+    for page_num, page in enumerate(pdf_reader.pages):
+        parts.append(f"\n\n--- Page {page_num + 1} ---\n\n{page.extract_text()}")
+        if on_page is not None:
+            on_page(page_num)
+    return "".join(parts)
+
+# Entries that do not change extracted text: page-tree links, embedded font
+# programs and stream encoding details
+FINGERPRINT_SKIP_KEYS = frozenset([
+    "/Parent", "/FontFile", "/FontFile2", "/FontFile3", "/Length", "/Filter", "/DecodeParms"
+])
+
+def _object_digest(obj, memo):
+    """Digest of a PDF object with every reference resolved, memoized per indirect object"""
+    from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+    
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in memo:
+            # Placeholder for reference cycles
+            memo[key] = f"ref {key}"
+            memo[key] = _object_digest(obj.get_object(), memo)
+        return memo[key]
+    
+    digest = hashlib.sha256(type(obj).__name__.encode("utf-8"))
+    if isinstance(obj, DictionaryObject):
+        for name in sorted(obj):
+            if name not in FINGERPRINT_SKIP_KEYS:
+                digest.update(f"{name}={_object_digest(obj.raw_get(name), memo)};".encode("utf-8"))
+        # Image data does not affect text; forms and other streams do
+        if isinstance(obj, StreamObject) and obj.get("/Subtype") != "/Image":
+            digest.update(obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            digest.update(f"{_object_digest(item, memo)},".encode("utf-8"))
+    else:
+        digest.update(repr(obj).encode("utf-8"))
+    return digest.hexdigest()
+
+def get_page_fingerprint(page, memo=None):
+    """
+    Fingerprint a page from everything its extracted text depends on
+    
+    Covers the content stream and the fully resolved resources: fonts with
+    their encodings and text mappings, and Form XObjects with their own
+    content and resources. Pages with the same fingerprint extract to the
+    same text, so the text can be reused without parsing the page again.
+    
+    Args:
+        page: PyPDF2 page object
+        memo (dict): Digests of shared objects, reused across pages of one document
+        
+    Returns:
+        str: SHA-256 hex digest, or None if the page cannot be fingerprinted
+    """
+    memo = {} if memo is None else memo
+    try:
+        digest = hashlib.sha256()
+        contents = page.get_contents()
+        if contents is not None:
+            digest.update(contents.get_data())
+        for name in ("/Resources", "/Rotate"):
+            if name in page:
+                digest.update(f"{name}={_object_digest(page.raw_get(name), memo)};".encode("utf-8"))
+        return digest.hexdigest()
+    except Exception:
+        return None
+
+def _extract_pages_incremental(pdf_reader, owner=None, on_page=None):
+    """Extract page text, reusing text the same owner already had extracted for identical pages"""
+    memo = {}
+    fingerprints = [get_page_fingerprint(page, memo) for page in pdf_reader.pages]
+    known_texts = {}
+    if owner is not None:
+        known_texts = page_store.get_page_texts(owner, [fingerprint for fingerprint in fingerprints if fingerprint])
+    parts = []
+    pages = []
+    extracted = 0
+    for page_num, (page, fingerprint) in enumerate(zip(pdf_reader.pages, fingerprints)):
+        page_text = known_texts.get(fingerprint)
+        if page_text is None:
+            page_text = page.extract_text()
+            extracted += 1
+        parts.append(f"\n\n--- Page {page_num + 1} ---\n\n{page_text}")
+        pages.append((page_num + 1, fingerprint, page_text))
+        if on_page is not None:
+            on_page(page_num)
+    return "".join(parts), pages, extracted
+
+def _metadata(pdf_reader):
+    metadata = pdf_reader.metadata or {}
+    return {str(key): str(value) for key, value in metadata.items()}
 
 def extract_text_from_pdf(pdf_file):
     """
@@ -14,12 +173,8 @@ def extract_text_from_pdf(pdf_file):
         str: Extracted text with page numbers
     """
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page_num, page in enumerate(pdf_reader.pages):
-            page_text = page.extract_text()
-            text += f"\n\n--- Page {page_num + 1} ---\n\n{page_text}"
-        return text
+        with open_pdf_reader(pdf_file) as pdf_reader:
+            return _extract_pages(pdf_reader)
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
@@ -34,11 +189,231 @@ def get_pdf_info(pdf_file):
         dict: PDF metadata
     """
     try:
-        pdf_file.seek(0)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        return {
-            "page_count": len(pdf_reader.pages),
-            "metadata": pdf_reader.metadata if hasattr(pdf_reader, 'metadata') else {}
-        }
+        with open_pdf_reader(pdf_file) as pdf_reader:
+            return {
+                "page_count": len(pdf_reader.pages),
+                "metadata": _metadata(pdf_reader)
+            }
+    except Exception as e:
+        return {"page_count": 0, "metadata": {}, "error": str(e)}
+
+def process_pdf(pdf_file, owner=None):
+    """
+    Extract text, page info and the section index from one parse of the file
+    
+    Peak RSS is sampled after every page so safe upload limits can be set.
+    Pages the same owner uploaded before, such as the unchanged pages of a
+    revised document, are not extracted again.
+    
+    Args:
+        pdf_file: Uploaded PDF file object
+        owner (str): User uploading the file; without one, every page is extracted
+        
+    Returns:
+        dict: text, sections, and info (page_count, metadata, size, spooled,
+            peak_rss and peak_rss_delta in bytes, pages_extracted, and
+            revision_of / changed_pages when it revises a document the same
+            owner uploaded before)
+    """
+    rss_before = get_rss_bytes()
+    peak_rss = [rss_before]
+    
+    def sample_rss(page_num):
+        peak_rss[0] = max(peak_rss[0], get_rss_bytes())
+    
+    try:
+        size = _file_size(pdf_file)
+        with open_pdf_reader(pdf_file) as pdf_reader:
+            text, pages, pages_extracted = _extract_pages_incremental(pdf_reader, owner, on_page=sample_rss)
+            sections = _section_index(pdf_reader, text)
+            info = {
+                "page_count": len(pdf_reader.pages),
+                "metadata": _metadata(pdf_reader)
+            }
+        
+        document_hash = get_document_hash(text)
+        page_hashes = get_page_hashes(text)
+        page_store.store_pages(owner, document_hash, pages, page_hashes)
+        previous_hash = page_store.find_previous_revision(owner, document_hash)
     except Exception as e:
-        return {"page_count": 0, "metadata": {}, "error": str(e)}
\ No newline at end of file
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+    
+    if previous_hash is not None:
+        info["revision_of"] = previous_hash
+        info["changed_pages"] = page_store.diff_pages(
+            page_store.get_document_page_hashes(owner, previous_hash), page_hashes
+        )
+    info["pages_extracted"] = pages_extracted
+    info.update({
+        "size": size,
+        "spooled": size > PDF_SPOOL_THRESHOLD,
+        "peak_rss": peak_rss[0],
+        "peak_rss_delta": peak_rss[0] - rss_before
+    })
+    return {"text": text, "sections": sections, "info": info}
+
+def get_document_hash(text):
+    """
+    Get a content hash identifying the document
+    
+    Args:
+        text (str): Extracted document text
+        
+    Returns:
+        str: SHA-256 hex digest of the text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def get_page_hashes(text):
+    """
+    Get a content hash of every page, to tell which pages a revision changed
+    
+    Args:
+        text (str): Text returned by extract_text_from_pdf
+        
+    Returns:
+        dict: Page number -> SHA-1 hex digest of the page text
+    """
+    return {
+        page_num: hashlib.sha1(page_text.encode("utf-8")).hexdigest()
+        for page_num, page_text in split_pages(text)
+    }
+
+def get_file_hash(pdf_file):
+    """
+    Get a content hash of an uploaded file without extracting it
+    
+    Args:
+        pdf_file: Uploaded PDF file object
+        
+    Returns:
+        str: SHA-256 hex digest of the file bytes
+    """
+    digest = hashlib.sha256()
+    position = pdf_file.tell()
+    pdf_file.seek(0)
+    for chunk in iter(lambda: pdf_file.read(PDF_SPOOL_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    pdf_file.seek(position)
+    return digest.hexdigest()
+
+def split_pages(text):
+    """
+    Split extracted text back into pages using the page markers
+    
+    Args:
+        text (str): Text returned by extract_text_from_pdf
+        
+    Returns:
+        list: (page_number, page_text) tuples
+    """
+    parts = PAGE_MARKER_PATTERN.split(text)
+    return [
+        (int(parts[i]), parts[i + 1].strip())
+        for i in range(1, len(parts) - 1, 2)
+    ]
+
+def select_pages(text, page_ranges):
+    """
+    Restrict extracted text to some pages, keeping their page markers
+    
+    Args:
+        text (str): Text returned by extract_text_from_pdf
+        page_ranges (list): [first_page, last_page] ranges to keep
+        
+    Returns:
+        str: Text of the selected pages
+    """
+    return "".join(
+        f"\n\n--- Page {page_num} ---\n\n{page_text}"
+        for page_num, page_text in split_pages(text)
+        if any(first <= page_num <= last for first, last in page_ranges)
+    )
+
+def _outline_sections(pdf_reader, outline, level=1):
+    """Flatten PDF outline entries into (title, start_page, level) tuples"""
+    sections = []
+    for item in outline:
+        if isinstance(item, list):
+            sections.extend(_outline_sections(pdf_reader, item, level + 1))
+            continue
+        try:
+            page_index = pdf_reader.get_destination_page_number(item)
+        except Exception:
+            continue
+        if page_index is not None and page_index >= 0:
+            sections.append((str(item.title).strip(), page_index + 1, level))
+    return sections
+
+def _detect_headings(text):
+    """Find chapter-style headings in the first lines of each page, skipping running headers"""
+    candidates = []
+    for page_num, page_text in split_pages(text):
+        lines = [line.strip() for line in page_text.splitlines() if line.strip()]
+        candidates.append((page_num, [line for line in lines[:3] if HEADING_PATTERN.match(line)]))
+    
+    repeats = {}
+    for _, lines in candidates:
+        for line in set(lines):
+            repeats[line] = repeats.get(line, 0) + 1
+    
+    sections = []
+    for page_num, lines in candidates:
+        for line in lines:
+            if repeats[line] <= MAX_HEADING_REPEATS:
+                sections.append((line, page_num, 1))
+                break
+    return sections
+
+def _section_index(pdf_reader, text):
+    """
+    Map document sections to page ranges
+    
+    Uses the PDF outline (bookmarks) when there is one and falls back to
+    detecting chapter-style headings in the extracted text.
+    
+    Args:
+        pdf_reader: Open PdfReader
+        text (str): Text extracted from the same reader
+        
+    Returns:
+        list: Section dictionaries with title, level, start_page and end_page,
+            in page order
+    """
+    page_count = len(split_pages(text))
+    try:
+        sections = _outline_sections(pdf_reader, pdf_reader.outline)
+    except Exception:
+        sections = []
+    if not sections:
+        sections = _detect_headings(text)
+    
+    sections.sort(key=lambda section: (section[1], section[2]))
+    index = []
+    for i, (title, start_page, level) in enumerate(sections):
+        # A section ends where the next section at the same or a higher level starts
+        end_page = page_count
+        for _, next_start, next_level in sections[i + 1:]:
+            if next_level <= level and next_start > start_page:
+                end_page = next_start - 1
+                break
+        index.append({
+            "title": title,
+            "level": level,
+            "start_page": start_page,
+            "end_page": max(start_page, end_page)
+        })
+    return index
+
+def get_section_text(text, section):
+    """
+    Get the text of one section
+    
+    Args:
+        text (str): Text returned by extract_text_from_pdf
+        section (dict): Entry of the "sections" list returned by process_pdf
+        
+    Returns:
+        str: Text of the section's pages, with page markers
+    """
+    return select_pages(text, [[section["start_page"], section["end_page"]]])
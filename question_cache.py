@@ -0,0 +1,262 @@
+"""
+Near-duplicate question cache shared across users of the same document
+"""
+import re
+import time
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // NUM_BANDS
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = (1 << 61) - 1
+
+QUESTION_STOP_WORDS = frozenset("""
+a an the is are was were be been do does did can could would should will shall may might please tell me
+explain describe give of in on for to about from by with this that these those
+document paper pdf text it its i we you
+""".split())
+# Words that flip or pin down a question's meaning; they must match exactly
+NEGATION_WORDS = frozenset(["not", "no", "never", "nor", "none", "without"])
+# Words that decide what kind of answer is asked for; they must match exactly
+QUESTION_WORDS = frozenset(["what", "which", "who", "whom", "whose", "how", "why", "when", "where"])
+MIN_QUESTION_TOKENS = 2
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+def normalize_question(question):
+    """
+    Normalize a question so rewordings map to the same token set
+
+    Args:
+        question (str): User's question
+
+    Returns:
+        str: Lowercased, sorted content words with simple plural/possessive stripping
+    """
+    words = re.findall(r"[a-z0-9]+", question.lower().replace("n't", " not").replace("'s", ""))
+    tokens = set()
+    for word in words:
+        if word in QUESTION_STOP_WORDS:
+            continue
+        if word == "whats":
+            word = "what"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.add(word)
+    return " ".join(sorted(tokens))
+
+def exact_tokens(tokens):
+    """Numbers, negation words and question words of a normalized question"""
+    return {
+        token for token in tokens
+        if token in NEGATION_WORDS or token in QUESTION_WORDS or any(c.isdigit() for c in token)
+    }
+
+def is_cacheable(normalized):
+    """
+    Whether a normalized question says enough to be matched against others
+
+    Questions made only of stop words and question words ("What is this
+    about?") or with one content word are too vague to share an answer.
+    """
+    return len([token for token in normalized.split() if token not in QUESTION_WORDS]) >= MIN_QUESTION_TOKENS
+
+def shingle(normalized):
+    """
+    Character shingles of a normalized question
+
+    Args:
+        normalized (str): Output of normalize_question
+
+    Returns:
+        set: Hashed shingles
+    """
+    if len(normalized) <= SHINGLE_SIZE:
+        return {zlib.crc32(normalized.encode())}
+    return {
+        zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode())
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+def minhash(shingles):
+    """
+    MinHash signature of a shingle set
+
+    Args:
+        shingles (set): Hashed shingles
+
+    Returns:
+        numpy.ndarray: Signature with NUM_PERMUTATIONS values
+    """
+    values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    hashed = (np.outer(_PERM_A, values) + _PERM_B[:, None]) % MERSENNE_PRIME
+    return hashed.min(axis=1)
+
+def jaccard(first, second):
+    """Exact Jaccard similarity of two shingle sets"""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+class _DocumentIndex:
+    """LSH index over the cached questions of one document"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.buckets = {}
+
+    def band_keys(self, signature):
+        return [
+            (band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes())
+            for band in range(NUM_BANDS)
+        ]
+
+    def add(self, normalized, entry):
+        self.remove(normalized)
+        self.entries[normalized] = entry
+        for key in self.band_keys(entry["signature"]):
+            self.buckets.setdefault(key, set()).add(normalized)
+
+    def remove(self, normalized):
+        entry = self.entries.pop(normalized, None)
+        if entry is None:
+            return
+        for key in self.band_keys(entry["signature"]):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(normalized)
+                if not bucket:
+                    del self.buckets[key]
+
+    def candidates(self, signature):
+        found = set()
+        for key in self.band_keys(signature):
+            found |= self.buckets.get(key, set())
+        return found
+
+class QuestionCache:
+    """
+    Per-document cache of answers, matched by near-duplicate question wording
+
+    Candidates are retrieved with MinHash/LSH and confirmed with exact Jaccard
+    similarity of both character shingles and words; numbers and negation
+    words must match exactly, and questions too vague to compare are never
+    cached. Each document keeps at most max_entries questions; the least
+    recently used one is evicted first, and entries older than ttl_seconds expire.
+    """
+
+    def __init__(self, threshold=0.8, max_entries=200, max_documents=100, ttl_seconds=None,
+                 word_threshold=0.6):
+        self.threshold = threshold
+        self.word_threshold = word_threshold
+        self.max_entries = max_entries
+        self.max_documents = max_documents
+        self.ttl_seconds = ttl_seconds
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _is_expired(self, entry, now):
+        return self.ttl_seconds is not None and now - entry["created"] > self.ttl_seconds
+
+    def lookup(self, document_hash, question):
+        """
+        Find a stored answer for a near-duplicate question
+
+        Args:
+            document_hash (str): Content hash of the document
+            question (str): User's question
+
+        Returns:
+            str: Cached answer or None if there is no confident match
+        """
+        normalized = normalize_question(question)
+        if not is_cacheable(normalized):
+            with self._lock:
+                self.misses += 1
+            return None
+        shingles = shingle(normalized)
+        tokens = set(normalized.split())
+        now = time.time()
+
+        with self._lock:
+            index = self._documents.get(document_hash)
+            best_key, best_score = None, 0.0
+            if index is not None:
+                self._documents.move_to_end(document_hash)
+                for key in index.candidates(minhash(shingles)):
+                    entry = index.entries[key]
+                    if self._is_expired(entry, now):
+                        index.remove(key)
+                        continue
+                    entry_tokens = set(key.split())
+                    if (exact_tokens(tokens) != exact_tokens(entry_tokens)
+                            or jaccard(tokens, entry_tokens) < self.word_threshold):
+                        continue
+                    score = jaccard(shingles, entry["shingles"])
+                    if score > best_score:
+                        best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            index.entries.move_to_end(best_key)
+            self.hits += 1
+            return index.entries[best_key]["answer"]
+
+    def store(self, document_hash, question, answer):
+        """
+        Store the answer to a question
+
+        Args:
+            document_hash (str): Content hash of the document
+            question (str): User's question
+            answer (str): Model answer
+        """
+        normalized = normalize_question(question)
+        if not is_cacheable(normalized):
+            return
+        shingles = shingle(normalized)
+        entry = {
+            "question": question,
+            "answer": answer,
+            "shingles": shingles,
+            "signature": minhash(shingles),
+            "created": time.time()
+        }
+
+        with self._lock:
+            index = self._documents.get(document_hash)
+            if index is None:
+                index = self._documents[document_hash] = _DocumentIndex()
+                while len(self._documents) > self.max_documents:
+                    self._documents.popitem(last=False)
+            self._documents.move_to_end(document_hash)
+
+            index.add(normalized, entry)
+            while len(index.entries) > self.max_entries:
+                index.remove(next(iter(index.entries)))
+
+    def stats(self):
+        """
+        Cache statistics
+
+        Returns:
+            dict: Hits, misses, hit rate and number of cached questions
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": sum(len(index.entries) for index in self._documents.values())
+            }
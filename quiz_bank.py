@@ -0,0 +1,176 @@
+"""
+Persistent per-document quiz question bank with background top-up
+"""
+import contextvars
+import hashlib
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    CACHE_DIR,
+    QUIZ_BANK_BATCH_SIZE,
+    QUIZ_BANK_LOW_WATERMARK,
+    QUIZ_BANK_MAX_SIZE,
+    QUIZ_BANK_MEMORY_SIZE
+)
+from pdf_processor import get_document_hash, get_page_hashes
+import page_store
+
+BANK_DIR = os.path.join(CACHE_DIR, "quiz_banks")
+
+_banks = OrderedDict()
+_bank_lock = threading.Lock()
+_refilling = set()
+_refill_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quiz-refill")
+
+def question_id(question):
+    """Stable id of a quiz question, based on its normalized text"""
+    normalized = " ".join(question["question"].lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+def _bank_path(document_hash):
+    return os.path.join(BANK_DIR, f"{document_hash}.json")
+
+def _get_bank(document_hash):
+    """Bank for a document, loaded from disk on first use; call with _bank_lock held"""
+    bank = _banks.get(document_hash)
+    if bank is None:
+        try:
+            with open(_bank_path(document_hash), encoding="utf-8") as f:
+                bank = json.load(f)
+        except (OSError, ValueError):
+            bank = []
+        _banks[document_hash] = bank
+        # Banks are saved on every change, so evicted ones reload from disk
+        while len(_banks) > QUIZ_BANK_MEMORY_SIZE:
+            _banks.popitem(last=False)
+    else:
+        _banks.move_to_end(document_hash)
+    return bank
+
+def _save_bank(document_hash, bank):
+    os.makedirs(BANK_DIR, exist_ok=True)
+    path = _bank_path(document_hash)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(bank, f)
+    os.replace(temp_path, path)
+
+def _carry_over_revision(document_hash, page_hashes, bank):
+    """
+    Seed a new document's bank with the previous revision's questions on unchanged pages
+
+    Call with _bank_lock held.
+    """
+    previous_hash = page_store.get_previous_revision(document_hash)
+    if previous_hash is None:
+        return 0
+    pages_by_hash = {text_hash: page_num for page_num, text_hash in page_hashes.items()}
+    for question in _get_bank(previous_hash):
+        page_num = pages_by_hash.get(question.get("page_hash"))
+        if page_num is not None:
+            # Pages may have moved in the revision
+            bank.append(dict(question, page=page_num))
+    if bank:
+        _save_bank(document_hash, list(bank))
+    return len(bank)
+
+def add_questions(document_hash, questions, page_hashes=None):
+    """
+    Add generated questions to a document's bank, skipping duplicates
+
+    Args:
+        document_hash (str): Content hash of the document
+        questions (list): Quiz question dictionaries
+        page_hashes (dict): Page number -> page content hash, recorded for
+            each question's source page so later revisions can keep it
+
+    Returns:
+        int: Number of questions added
+    """
+    page_hashes = page_hashes or {}
+    with _bank_lock:
+        bank = _get_bank(document_hash)
+        known = {question["id"] for question in bank}
+        added = 0
+        for question in questions:
+            question = dict(question, id=question_id(question))
+            page_hash = page_hashes.get(question.get("page"))
+            if page_hash is not None:
+                question["page_hash"] = page_hash
+            if question["id"] not in known and len(bank) < QUIZ_BANK_MAX_SIZE:
+                bank.append(question)
+                known.add(question["id"])
+                added += 1
+        if added:
+            _save_bank(document_hash, list(bank))
+        return added
+
+def _generate_batch(text, document_hash, num_questions):
+    from ai_services import generate_quiz
+
+    with _bank_lock:
+        existing = [question["question"] for question in _get_bank(document_hash)]
+    return add_questions(document_hash, generate_quiz(text, num_questions, existing), get_page_hashes(text))
+
+def _refill(text, document_hash):
+    try:
+        _generate_batch(text, document_hash, QUIZ_BANK_BATCH_SIZE)
+    except Exception:
+        # A failed top-up is retried the next time the bank runs low
+        pass
+    finally:
+        with _bank_lock:
+            _refilling.discard(document_hash)
+
+def _schedule_refill(text, document_hash):
+    with _bank_lock:
+        if document_hash in _refilling or len(_get_bank(document_hash)) >= QUIZ_BANK_MAX_SIZE:
+            return
+        _refilling.add(document_hash)
+    # Runs in a copy of the caller's context, so the top-up is billed to the same
+    # user and session and stops with the caller's job
+    _refill_executor.submit(contextvars.copy_context().run, _refill, text, document_hash)
+
+def draw_quiz(text, num_questions=5, seen_ids=()):
+    """
+    Draw a quiz from the document's bank, generating questions only when needed
+
+    When the bank has enough questions this user has not seen, the quiz is
+    sampled with no model call. When few unseen questions remain, the bank is
+    topped up in the background for the next quiz. A revised document starts
+    with the previous revision's questions on pages that did not change.
+
+    Args:
+        text (str): Document text
+        num_questions (int): Number of questions
+        seen_ids (iterable): Ids of questions this user has already been given
+
+    Returns:
+        list: Quiz question dictionaries, each with an "id"
+    """
+    document_hash = get_document_hash(text)
+    seen_ids = set(seen_ids)
+
+    with _bank_lock:
+        bank = _get_bank(document_hash)
+        if not bank:
+            _carry_over_revision(document_hash, get_page_hashes(text), bank)
+        unseen = [q for q in bank if q["id"] not in seen_ids]
+
+    if len(unseen) < num_questions:
+        _generate_batch(text, document_hash, max(num_questions, QUIZ_BANK_BATCH_SIZE))
+        with _bank_lock:
+            bank = _get_bank(document_hash)
+            unseen = [q for q in bank if q["id"] not in seen_ids]
+            if len(unseen) < num_questions:
+                # This user has seen the whole bank; repeat questions rather than fail
+                unseen = list(bank)
+
+    quiz = random.sample(unseen, min(num_questions, len(unseen)))
+    if len(unseen) - len(quiz) < QUIZ_BANK_LOW_WATERMARK:
+        _schedule_refill(text, document_hash)
+    return quiz
@@ -0,0 +1,260 @@
+"""
+Compact per-user session snapshots, so a refresh restores work without re-extraction or model calls
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from config import (
+    CACHE_DIR,
+    SNAPSHOT_MAX_AGE_SECONDS,
+    SNAPSHOT_MAX_TOTAL_BYTES,
+    SNAPSHOT_GC_INTERVAL
+)
+
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "snapshots")
+SNAPSHOT_FIELDS = (
+    "pdf_text",
+    "sections",
+    "pdf_info",
+    "document_hash",
+    "summary",
+    "qa_history",
+    "quiz",
+    "seen_quiz_ids"
+)
+USER_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+SECRET_KEY_PATH = os.path.join(CACHE_DIR, "secret_key")
+
+_lock = threading.Lock()
+_saved_signatures = {}
+_last_gc = {"time": 0.0}
+_secret = {"key": None}
+
+def _secret_key():
+    """Key for signing user tokens, from SUMMAREASE_SECRET_KEY or generated once and kept in the cache"""
+    key = os.getenv("SUMMAREASE_SECRET_KEY")
+    if key:
+        return key.encode("utf-8")
+    with _lock:
+        if _secret["key"] is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            try:
+                fd = os.open(SECRET_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(os.urandom(32))
+            except FileExistsError:
+                # Created earlier or by another app process
+                pass
+            with open(SECRET_KEY_PATH, "rb") as f:
+                _secret["key"] = f.read()
+        return _secret["key"]
+
+def _signature_of(user_id):
+    return hmac.new(_secret_key(), user_id.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+def issue_user_token():
+    """
+    Create a new user id and the signed token that identifies it
+
+    Returns:
+        tuple: (user_id, token)
+    """
+    user_id = uuid.uuid4().hex
+    return user_id, f"{user_id}.{_signature_of(user_id)}"
+
+def verify_user_token(token):
+    """
+    Check a user token
+
+    Anyone holding a valid token can restore that user's snapshots, so it
+    must be treated like a password.
+
+    Args:
+        token (str): Token from issue_user_token
+
+    Returns:
+        str: User id, or None if the token is malformed or not signed by this server
+    """
+    user_id, _, signature = (token or "").partition(".")
+    if not USER_ID_PATTERN.match(user_id) or not hmac.compare_digest(signature, _signature_of(user_id)):
+        return None
+    return user_id
+
+def delete_user_snapshots(user_id):
+    """
+    Delete every snapshot of a user
+
+    Args:
+        user_id (str): Stable user id
+    """
+    with _lock:
+        shutil.rmtree(_user_dir(user_id), ignore_errors=True)
+        for key in [key for key in _saved_signatures if key[0] == user_id]:
+            del _saved_signatures[key]
+
+def _user_dir(user_id):
+    if not USER_ID_PATTERN.match(user_id or ""):
+        raise ValueError("Invalid user id")
+    return os.path.join(SNAPSHOT_DIR, user_id)
+
+def _snapshot_path(user_id, document_hash):
+    return os.path.join(_user_dir(user_id), f"{document_hash}.json.gz")
+
+def _index_path(user_id):
+    return os.path.join(_user_dir(user_id), "index.json")
+
+def _load_index(user_id):
+    try:
+        with open(_index_path(user_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_atomic(path, data):
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def _signature(state):
+    """Hash of the fields that change while working on one document"""
+    changing = {field: state.get(field) for field in SNAPSHOT_FIELDS if field != "pdf_text"}
+    return hashlib.sha1(json.dumps(changing, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def save_snapshot(user_id, file_hash, file_name, state):
+    """
+    Save a user's work on a document, skipping the write when nothing changed
+
+    Args:
+        user_id (str): Stable user id
+        file_hash (str): Content hash of the uploaded file
+        file_name (str): Uploaded file name, shown when offering a restore
+        state (Mapping): Session state holding SNAPSHOT_FIELDS
+
+    Returns:
+        bool: True if a snapshot was written
+    """
+    document_hash = state.get("document_hash")
+    if not document_hash:
+        return False
+    signature = _signature(state)
+    key = (user_id, document_hash)
+    if _saved_signatures.get(key) == signature:
+        return False
+
+    snapshot = {field: state.get(field) for field in SNAPSHOT_FIELDS}
+    data = gzip.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"), compresslevel=5)
+    with _lock:
+        os.makedirs(_user_dir(user_id), exist_ok=True)
+        _write_atomic(_snapshot_path(user_id, document_hash), data)
+        index = _load_index(user_id)
+        index[document_hash] = {"file_hash": file_hash, "file_name": file_name, "saved": time.time()}
+        _write_atomic(_index_path(user_id), json.dumps(index).encode("utf-8"))
+        _saved_signatures[key] = signature
+
+    if time.time() - _last_gc["time"] > SNAPSHOT_GC_INTERVAL:
+        collect_garbage()
+    return True
+
+def load_snapshot(user_id, document_hash):
+    """
+    Load a user's snapshot of a document
+
+    Args:
+        user_id (str): Stable user id
+        document_hash (str): Content hash of the document text
+
+    Returns:
+        dict: Snapshot fields, or None if there is no snapshot
+    """
+    path = _snapshot_path(user_id, document_hash)
+    try:
+        with open(path, "rb") as f:
+            snapshot = json.loads(gzip.decompress(f.read()))
+    except (OSError, ValueError, EOFError):
+        return None
+    # Restored snapshots count as recently used for garbage collection
+    os.utime(path)
+    _saved_signatures[(user_id, document_hash)] = _signature(snapshot)
+    return snapshot
+
+def find_snapshot(user_id, file_hash):
+    """
+    Find a user's snapshot of an uploaded file
+
+    Args:
+        user_id (str): Stable user id
+        file_hash (str): Content hash of the uploaded file
+
+    Returns:
+        dict: Snapshot fields, or None if there is no snapshot
+    """
+    for document_hash, entry in _load_index(user_id).items():
+        if entry["file_hash"] == file_hash:
+            return load_snapshot(user_id, document_hash)
+    return None
+
+def list_snapshots(user_id):
+    """
+    List a user's snapshots, most recent first
+
+    Args:
+        user_id (str): Stable user id
+
+    Returns:
+        list: Dictionaries with document_hash, file_hash, file_name and saved time
+    """
+    entries = [dict(entry, document_hash=document_hash) for document_hash, entry in _load_index(user_id).items()]
+    return sorted(entries, key=lambda entry: -entry["saved"])
+
+def collect_garbage(max_age=SNAPSHOT_MAX_AGE_SECONDS, max_total_bytes=SNAPSHOT_MAX_TOTAL_BYTES):
+    """
+    Delete snapshots older than max_age, then the least recently used ones until under max_total_bytes
+
+    Args:
+        max_age (float): Maximum snapshot age in seconds
+        max_total_bytes (int): Maximum total size of all snapshots
+
+    Returns:
+        int: Number of snapshots deleted
+    """
+    with _lock:
+        _last_gc["time"] = time.time()
+        snapshots = []
+        try:
+            user_ids = os.listdir(SNAPSHOT_DIR)
+        except OSError:
+            return 0
+        for user_id in user_ids:
+            if not USER_ID_PATTERN.match(user_id):
+                continue
+            for name in os.listdir(_user_dir(user_id)):
+                if name.endswith(".json.gz"):
+                    stat = os.stat(os.path.join(_user_dir(user_id), name))
+                    snapshots.append((stat.st_mtime, stat.st_size, user_id, name[:-len(".json.gz")]))
+
+        snapshots.sort()
+        total_bytes = sum(size for _, size, _, _ in snapshots)
+        cutoff = time.time() - max_age
+        removed = {}
+        for mtime, size, user_id, document_hash in snapshots:
+            if mtime >= cutoff and total_bytes <= max_total_bytes:
+                break
+            os.remove(_snapshot_path(user_id, document_hash))
+            _saved_signatures.pop((user_id, document_hash), None)
+            removed.setdefault(user_id, []).append(document_hash)
+            total_bytes -= size
+
+        for user_id, document_hashes in removed.items():
+            index = _load_index(user_id)
+            for document_hash in document_hashes:
+                index.pop(document_hash, None)
+            _write_atomic(_index_path(user_id), json.dumps(index).encode("utf-8"))
+        return sum(len(document_hashes) for document_hashes in removed.values())
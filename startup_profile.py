@@ -0,0 +1,82 @@
+"""
+Startup profile report: how long a fresh worker takes to import what it needs
+
+Run with:
+    python startup_profile.py
+"""
+import os
+import subprocess
+import sys
+import time
+
+# Imported by main.py before the first page render; dotenv is loaded by
+# configure_gemini() during it
+STARTUP_MODULES = [
+    "streamlit", "config", "dotenv", "pdf_processor", "session_snapshots", "usage_ledger", "ui_components"
+]
+
+# Imported lazily on first upload or first model call
+DEFERRED_MODULES = ["PyPDF2", "ai_services", "google.generativeai"]
+
+def profile_imports(modules):
+    """
+    Import modules in a fresh interpreter with -X importtime
+
+    Args:
+        modules (list): Module names to import
+
+    Returns:
+        dict: Wall time in seconds and {package: cumulative microseconds}
+            for the top-level imports
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+    wall_time = time.perf_counter() - start
+
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ""
+        return {"wall_time": wall_time, "imports": {}, "error": error}
+
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level imports are not indented
+        if not name.startswith("  "):
+            imports[name.strip()] = int(cumulative)
+    return {"wall_time": wall_time, "imports": imports}
+
+def format_report(startup, deferred):
+    """
+    Format the startup profile as text
+
+    Args:
+        startup (dict): profile_imports result for the startup modules
+        deferred (dict): profile_imports result for the deferred modules
+
+    Returns:
+        str: Report text
+    """
+    lines = ["Startup Profile", "=" * 60, ""]
+    for title, profile in (("Ready to serve (startup imports)", startup),
+                           ("Fully loaded (startup + deferred imports)", deferred)):
+        lines.append(f"{title}: {profile['wall_time'] * 1000:.0f} ms wall time")
+        if profile.get("error"):
+            lines.append(f"  failed: {profile['error']}")
+        ranked = sorted(profile["imports"].items(), key=lambda item: -item[1])
+        for name, cumulative in ranked[:15]:
+            lines.append(f"  {cumulative / 1000:10.1f} ms  {name}")
+        lines.append("")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    startup = profile_imports(STARTUP_MODULES)
+    deferred = profile_imports(STARTUP_MODULES + DEFERRED_MODULES)
+    print(format_report(startup, deferred))
@@ -0,0 +1,330 @@
+"""
+Persistent hierarchical summaries (pages -> sections -> document) per content hash
+"""
+import contextvars
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    CACHE_DIR,
+    SUMMARY_TREE_PAGES_PER_LEAF,
+    SUMMARY_TREE_LEAVES_PER_SECTION,
+    SUMMARY_TREE_BUILD_WORKERS,
+    SUMMARY_TREE_MEMORY_SIZE
+)
+from extractive_summarizer import WORD_PATTERN, STOP_WORDS
+from pdf_processor import get_document_hash, get_page_hashes, split_pages
+import page_store
+
+TREE_DIR = os.path.join(CACHE_DIR, "summary_trees")
+
+_trees = OrderedDict()
+_trees_lock = threading.Lock()
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+def _page_label(first_page, last_page):
+    if first_page == last_page:
+        return f"Page {first_page}"
+    return f"Pages {first_page}-{last_page}"
+
+def _summarize_leaf(generate, pages, page_hashes):
+    first_page, last_page = pages[0][0], pages[-1][0]
+    body = "".join(f"\n\n--- Page {num} ---\n\n{page_text}" for num, page_text in pages)
+    prompt = f"""Summarize the following pages of a document in one short paragraph.
+Keep every important fact, name and number, and mark where each point comes from using the format [Page X].
+
+{_page_label(first_page, last_page)}:
+{body}
+"""
+    return {
+        "pages": [first_page, last_page],
+        "page_hashes": page_hashes,
+        "summary": generate(prompt, "tree:leaf")
+    }
+
+def _summarize_section(generate, leaves, leaf_ids):
+    first_page = leaves[leaf_ids[0]]["pages"][0]
+    last_page = leaves[leaf_ids[-1]]["pages"][1]
+    body = "\n\n".join(
+        f"{_page_label(*leaves[i]['pages'])}:\n{leaves[i]['summary']}" for i in leaf_ids
+    )
+    prompt = f"""Combine the following partial summaries of one section of a document into a single summary of that section.
+Describe the main topics and key points in a few paragraphs.
+
+{body}
+"""
+    return {
+        "pages": [first_page, last_page],
+        "leaves": leaf_ids,
+        "summary": generate(prompt, "tree:section")
+    }
+
+def _summarize_root(generate, sections):
+    body = "\n\n".join(
+        f"{_page_label(*section['pages'])}:\n{section['summary']}" for section in sections
+    )
+    prompt = f"""Provide a brief, concise summary of the whole document in 3-5 sentences, based on these section summaries.
+Focus on the most important points only.
+
+{body}
+"""
+    return generate(prompt, "tree:root")
+
+def _leaf_key(leaf):
+    return tuple(tuple(entry) for entry in leaf.get("page_hashes", ()))
+
+def _section_key(leaves, leaf_ids):
+    return tuple((tuple(leaves[i]["pages"]), leaves[i]["summary"]) for i in leaf_ids)
+
+def build_summary_tree(text, generate, previous=None, on_node=None):
+    """
+    Build the summary hierarchy for a document
+    
+    With the tree of a previous revision, or the nodes saved by an
+    interrupted build, leaves whose pages are unchanged are reused, as are
+    sections whose leaves were all reused and the root when no section
+    changed, so only the missing part of the tree is summarized.
+    
+    Args:
+        text (str): Document text with page markers
+        generate (callable): (prompt, operation) -> response text
+        previous (dict): Tree or partial tree ("leaves" and "sections") to reuse nodes from
+        on_node (callable): Called with ("leaf", leaf) or ("section", section
+            with its leaf_nodes) as each newly summarized node completes
+        
+    Returns:
+        dict: Tree with leaves (page groups), sections (leaf groups) and root summary
+    """
+    pages = [(num, page_text) for num, page_text in split_pages(text) if page_text]
+    page_hashes = get_page_hashes(text)
+    page_groups = [
+        pages[i:i + SUMMARY_TREE_PAGES_PER_LEAF]
+        for i in range(0, len(pages), SUMMARY_TREE_PAGES_PER_LEAF)
+    ]
+    
+    previous_leaves = {}
+    previous_sections = {}
+    if previous:
+        previous_leaves = {_leaf_key(leaf): leaf for leaf in previous["leaves"] if "page_hashes" in leaf}
+        previous_sections = {
+            _section_key(previous["leaves"], section["leaves"]): section["summary"]
+            for section in previous["sections"]
+        }
+    
+    def run_all(fn, items, reused, report):
+        # Each call runs in a copy of the caller's context so job cancellation applies
+        futures = [
+            None if reuse is not None else executor.submit(contextvars.copy_context().run, fn, generate, *item)
+            for item, reuse in zip(items, reused)
+        ]
+        if on_node is not None:
+            # Report nodes as they finish, so paid-for work survives a cancelled build
+            for future in futures:
+                if future is not None:
+                    future.add_done_callback(
+                        lambda done: done.cancelled() or done.exception() or report(done.result())
+                    )
+        return [reuse if future is None else future.result() for future, reuse in zip(futures, reused)]
+    
+    with ThreadPoolExecutor(max_workers=SUMMARY_TREE_BUILD_WORKERS) as executor:
+        leaf_items = [
+            (group, [[num, page_hashes[num]] for num, _ in group])
+            for group in page_groups
+        ]
+        leaves = run_all(
+            _summarize_leaf,
+            leaf_items,
+            [previous_leaves.get(_leaf_key({"page_hashes": hashes})) for _, hashes in leaf_items],
+            lambda leaf: on_node("leaf", leaf)
+        )
+        leaf_groups = [
+            list(range(i, min(i + SUMMARY_TREE_LEAVES_PER_SECTION, len(leaves))))
+            for i in range(0, len(leaves), SUMMARY_TREE_LEAVES_PER_SECTION)
+        ]
+        reused_sections = []
+        for leaf_ids in leaf_groups:
+            summary = previous_sections.get(_section_key(leaves, leaf_ids))
+            reused_sections.append(None if summary is None else {
+                "pages": [leaves[leaf_ids[0]]["pages"][0], leaves[leaf_ids[-1]]["pages"][1]],
+                "leaves": leaf_ids,
+                "summary": summary
+            })
+        sections = run_all(
+            _summarize_section,
+            [(leaves, leaf_ids) for leaf_ids in leaf_groups],
+            reused_sections,
+            lambda section: on_node("section", dict(section, leaf_nodes=[leaves[i] for i in section["leaves"]]))
+        )
+    
+    if previous and previous.get("root") and [(section["pages"], section["summary"]) for section in sections] == [
+        (section["pages"], section["summary"]) for section in previous["sections"]
+    ]:
+        root = previous["root"]
+    else:
+        root = _summarize_root(generate, sections) if sections else ""
+    
+    return {
+        "leaves": leaves,
+        "sections": sections,
+        "root": root
+    }
+
+def _tree_path(document_hash):
+    return os.path.join(TREE_DIR, f"{document_hash}.json")
+
+def _load_tree(document_hash):
+    try:
+        with open(_tree_path(document_hash), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_tree(document_hash, tree):
+    os.makedirs(TREE_DIR, exist_ok=True)
+    path = _tree_path(document_hash)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(tree, f)
+    os.replace(temp_path, path)
+
+def _partial_path(document_hash):
+    return os.path.join(TREE_DIR, f"{document_hash}.partial.jsonl")
+
+def _load_partial(document_hash):
+    """Nodes saved by interrupted builds, as a partial tree with leaves and sections"""
+    partial = {"leaves": [], "sections": []}
+    try:
+        with open(_partial_path(document_hash), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    kind, node = json.loads(line)
+                except ValueError:
+                    # The last line of a crashed build may be incomplete
+                    continue
+                partial["leaves" if kind == "leaf" else "sections"].append(node)
+    except OSError:
+        return None
+    # Saved sections carry their own leaves; give them ids in the partial tree
+    sections = partial["sections"]
+    partial["sections"] = []
+    for section in sections:
+        leaf_nodes = section.pop("leaf_nodes")
+        first_id = len(partial["leaves"])
+        partial["leaves"].extend(leaf_nodes)
+        partial["sections"].append(dict(section, leaves=list(range(first_id, first_id + len(leaf_nodes)))))
+    return partial
+
+def _remember(document_hash, tree):
+    with _trees_lock:
+        _trees[document_hash] = tree
+        _trees.move_to_end(document_hash)
+        while len(_trees) > SUMMARY_TREE_MEMORY_SIZE:
+            _trees.popitem(last=False)
+
+def _cached_tree(document_hash):
+    with _trees_lock:
+        tree = _trees.get(document_hash)
+        if tree is not None:
+            _trees.move_to_end(document_hash)
+        return tree
+
+def _merge_trees(first, second):
+    """Combine the reusable nodes of two (partial) trees"""
+    trees = [tree for tree in (first, second) if tree]
+    if len(trees) < 2:
+        return trees[0] if trees else None
+    offset = len(trees[0]["leaves"])
+    return {
+        "leaves": trees[0]["leaves"] + trees[1]["leaves"],
+        "sections": trees[0]["sections"] + [
+            dict(section, leaves=[i + offset for i in section["leaves"]]) for section in trees[1]["sections"]
+        ]
+    }
+
+def get_summary_tree(text, generate):
+    """
+    Get the summary tree for a document, building and persisting it on first use
+    
+    Nodes are saved as they complete, so a build stopped by a job deadline
+    or cancellation resumes where it left off on the next request.
+
+    Args:
+        text (str): Document text with page markers
+        generate (callable): (prompt, operation) -> response text
+
+    Returns:
+        dict: Summary tree (see build_summary_tree)
+    """
+    document_hash = get_document_hash(text)
+    tree = _cached_tree(document_hash)
+    if tree is not None:
+        return tree
+
+    with _build_locks_lock:
+        entry = _build_locks.setdefault(document_hash, [threading.Lock(), 0])
+        entry[1] += 1
+
+    try:
+        # Only one session builds a given document's tree; the rest wait and reuse it
+        with entry[0]:
+            tree = _cached_tree(document_hash) or _load_tree(document_hash)
+            if tree is None:
+                # A revised document only summarizes what changed since its previous revision
+                previous_hash = page_store.get_previous_revision(document_hash)
+                previous = None
+                if previous_hash is not None:
+                    previous = _cached_tree(previous_hash) or _load_tree(previous_hash)
+                previous = _merge_trees(_load_partial(document_hash), previous)
+                
+                os.makedirs(TREE_DIR, exist_ok=True)
+                partial_lock = threading.Lock()
+                with open(_partial_path(document_hash), "a", encoding="utf-8") as partial:
+                    def save_node(kind, node):
+                        with partial_lock:
+                            partial.write(json.dumps([kind, node]) + "\n")
+                            partial.flush()
+                    
+                    tree = build_summary_tree(text, generate, previous, on_node=save_node)
+                _save_tree(document_hash, tree)
+                os.remove(_partial_path(document_hash))
+            _remember(document_hash, tree)
+            return tree
+    finally:
+        with _build_locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _build_locks[document_hash]
+
+def _keywords(text):
+    return {word for word in WORD_PATTERN.findall(text.lower()) if word not in STOP_WORDS}
+
+def _overlap(keywords, text):
+    return len(keywords & _keywords(text))
+
+def find_relevant_pages(tree, question, max_sections=3, max_leaves=4):
+    """
+    Walk the tree from sections down to the leaves most relevant to a question
+
+    Args:
+        tree (dict): Summary tree
+        question (str): User's question
+        max_sections (int): Sections to descend into
+        max_leaves (int): Leaves to return
+
+    Returns:
+        list: [first_page, last_page] ranges of the relevant leaves, in page order
+    """
+    keywords = _keywords(question)
+    sections = sorted(
+        tree["sections"],
+        key=lambda section: -_overlap(keywords, section["summary"])
+    )[:max_sections]
+    leaf_ids = [leaf_id for section in sections for leaf_id in section["leaves"]]
+    leaf_ids = sorted(
+        leaf_ids,
+        key=lambda leaf_id: -_overlap(keywords, tree["leaves"][leaf_id]["summary"])
+    )[:max_leaves]
+    return [tree["leaves"][leaf_id]["pages"] for leaf_id in sorted(leaf_ids)]
@@ -3,6 +3,92 @@ UI Components for the Streamlit application
 """
 import streamlit as st
 
+def get_session_id():
+    """Get a unique id for the current browser session"""
+    if "session_id" not in st.session_state:
+        import uuid
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def get_user_id():
+    """
+    Get a stable id for the user, kept in the page URL so it survives a refresh
+    
+    The URL carries a token signed by the server, so ids cannot be guessed
+    or forged, but anyone given the full link can restore this user's work.
+    """
+    if "user_id" not in st.session_state:
+        from session_snapshots import issue_user_token, verify_user_token
+        
+        user_id = verify_user_token(st.experimental_get_query_params().get("user", [""])[0])
+        if user_id is None:
+            user_id, token = issue_user_token()
+            st.experimental_set_query_params(user=token)
+        st.session_state.user_id = user_id
+    return st.session_state.user_id
+
+def forget_user():
+    """Delete this user's snapshots and stored page text and continue under a new id, invalidating shared links"""
+    from page_store import delete_owner_pages
+    from session_snapshots import delete_user_snapshots, issue_user_token
+    
+    delete_user_snapshots(get_user_id())
+    delete_owner_pages(get_user_id())
+    user_id, token = issue_user_token()
+    st.experimental_set_query_params(user=token)
+    st.session_state.user_id = user_id
+
+def restore_session_state(snapshot):
+    """
+    Replace the document state with a snapshot, or reset it when snapshot is empty
+    
+    Args:
+        snapshot (dict): Fields from session_snapshots.load_snapshot
+    """
+    defaults = {
+        "pdf_text": "",
+        "sections": [],
+        "pdf_info": {},
+        "document_hash": "",
+        "summary": "",
+        "qa_history": [],
+        "quiz": [],
+        "seen_quiz_ids": []
+    }
+    for field, default in defaults.items():
+        st.session_state[field] = snapshot.get(field, default)
+
+def run_model_job(widget, fn, *args):
+    """
+    Run model work as a cancellable job with the widget's deadline
+    
+    A newer job for the same session and widget cancels this one. If the
+    script is interrupted by a rerun while waiting, the job is cancelled too.
+    
+    Args:
+        widget (str): Operation name from JOB_DEADLINES
+        fn (callable): Model work to run
+        
+    Returns:
+        Result of fn
+    """
+    from config import JOB_DEADLINES
+    from jobs import submit_job, wait_for_job
+    
+    job = submit_job(get_session_id(), widget, fn, *args, deadline=JOB_DEADLINES[widget])
+    status = st.empty()
+    try:
+        # Updating the status gives Streamlit a chance to interrupt the wait on rerun
+        return wait_for_job(job, on_tick=lambda elapsed: status.caption(f"⏳ {elapsed:.0f}s elapsed"))
+    except BaseException:
+        # Stop work the script no longer waits for, e.g. after a rerun; jobs that
+        # already finished with an error are not counted as cancelled
+        if not job.future.done():
+            job.cancel()
+        raise
+    finally:
+        status.empty()
+
 def render_sidebar():
     """Render the sidebar with project information"""
     with st.sidebar:
@@ -56,7 +142,7 @@ def render_landing_page():
     ### How to use:
     1. **Upload PDF**: Upload your PDF document above
     2. **Explore Features**:
-       - Generate summaries (comprehensive, brief, or with references)
+       - Generate summaries (comprehensive, brief, with references, or extractive)
        - Ask questions about the document
        - Generate and take quizzes
        - View the PDF content
@@ -71,9 +157,78 @@ def render_landing_page():
     - **Export Options**: Download summaries and Q&A history
     """)
 
+def render_snapshot_restore():
+    """Offer to resume documents this user worked on before"""
+    from session_snapshots import list_snapshots, load_snapshot
+    
+    snapshots = list_snapshots(get_user_id())[:5]
+    if not snapshots:
+        return
+    
+    st.markdown("### Resume where you left off:")
+    for entry in snapshots:
+        if st.button(f"📄 {entry['file_name']}", key=f"resume_{entry['document_hash']}"):
+            snapshot = load_snapshot(get_user_id(), entry["document_hash"])
+            if snapshot:
+                restore_session_state(snapshot)
+                st.session_state.file_hash = entry["file_hash"]
+                st.session_state.file_name = entry["file_name"]
+                st.session_state.upload_key = None
+                st.session_state.resumed = True
+                st.rerun()
+    
+    st.caption("Anyone with this page's link can resume these documents.")
+    if st.button("🗑️ Forget these documents"):
+        forget_user()
+        st.rerun()
+
+def render_budget_status():
+    """Warn when the user's or everyone's spending today passes a soft budget"""
+    from usage_ledger import get_budget_status
+    
+    status = get_budget_status(get_user_id())
+    if status["user_exceeded"] or status["daily_exceeded"]:
+        st.error("⛔ Usage budget reached. New summaries, answers and quizzes are paused.")
+    elif status["user_warning"]:
+        st.warning(f"⚠️ You have used ${status['user_cost']:.2f} of today's AI budget.")
+    elif status["daily_warning"]:
+        st.warning("⚠️ Today's AI usage is close to the daily budget.")
+
+def render_section_selector(pdf_text, sections):
+    """
+    Render the section selector and return the text to work on
+    
+    Args:
+        pdf_text (str): Full document text
+        sections (list): Section index returned by process_pdf
+        
+    Returns:
+        str: Full text, or only the selected section's pages
+    """
+    from pdf_processor import get_section_text
+    
+    if not sections:
+        return pdf_text
+    
+    labels = ["Whole document"] + [
+        f"{'– ' * (section['level'] - 1)}{section['title']} "
+        f"(pages {section['start_page']}-{section['end_page']})"
+        for section in sections
+    ]
+    choice = st.selectbox(
+        "Section",
+        range(len(labels)),
+        format_func=lambda i: labels[i],
+        help="Summaries, answers and quizzes use only the selected section's pages"
+    )
+    if choice == 0:
+        return pdf_text
+    return get_section_text(pdf_text, sections[choice - 1])
+
 def render_summary_tab(pdf_text):
     """Render the Summary tab content"""
     from ai_services import generate_summary
+    from jobs import JobTimeout
     
     st.header("Document Summary")
     
@@ -81,13 +236,15 @@ def render_summary_tab(pdf_text):
     with col1:
         summary_type = st.selectbox(
             "Summary Type",
-            ["comprehensive", "brief", "reference-linked"]
+            ["comprehensive", "brief", "reference-linked", "extractive"]
         )
     
     if st.button("Generate Summary", type="primary"):
         with st.spinner("Generating summary..."):
             try:
-                st.session_state.summary = generate_summary(pdf_text, summary_type)
+                st.session_state.summary = run_model_job("summary", generate_summary, pdf_text, summary_type)
+            except JobTimeout as e:
+                st.warning(f"Summary generation stopped: {e}")
             except Exception as e:
                 st.error(str(e))
     
@@ -97,7 +254,8 @@ def render_summary_tab(pdf_text):
 
 def render_qa_tab(pdf_text):
     """Render the Q&A tab content"""
-    from ai_services import answer_question
+    from ai_services import answer_question_cached, question_cache
+    from jobs import JobTimeout
     from datetime import datetime
     
     st.header("Question & Answer")
@@ -108,13 +266,16 @@ def render_qa_tab(pdf_text):
         if question:
             with st.spinner("Finding answer..."):
                 try:
-                    answer = answer_question(pdf_text, question)
+                    answer, cached = run_model_job("qa", answer_question_cached, pdf_text, question)
                     if answer:
                         st.session_state.qa_history.append({
                             "question": question,
                             "answer": answer,
+                            "cached": cached,
                             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                         })
+                except JobTimeout as e:
+                    st.warning(f"Answer stopped: {e}")
                 except Exception as e:
                     st.error(str(e))
     
@@ -124,11 +285,22 @@ def render_qa_tab(pdf_text):
         for i, qa in enumerate(reversed(st.session_state.qa_history)):
             with st.expander(f"Q: {qa['question']}", expanded=(i==0)):
                 st.markdown(f"**Answer:** {qa['answer']}")
-                st.caption(f"Asked at: {qa['timestamp']}")
+                if qa.get("cached"):
+                    st.caption(f"⚡ Cached answer · Asked at: {qa['timestamp']}")
+                else:
+                    st.caption(f"Asked at: {qa['timestamp']}")
+    
+    cache_stats = question_cache.stats()
+    if cache_stats["hits"] + cache_stats["misses"]:
+        st.caption(
+            f"Question cache hit rate: {cache_stats['hit_rate']:.0%} "
+            f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)"
+        )
 
 def render_quiz_tab(pdf_text):
     """Render the Quiz tab content"""
-    from ai_services import generate_quiz
+    from jobs import JobTimeout
+    from quiz_bank import draw_quiz
     
     st.header("Quiz Generation")
     
@@ -137,7 +309,11 @@ def render_quiz_tab(pdf_text):
     if st.button("Generate Quiz", type="primary"):
         with st.spinner("Generating quiz..."):
             try:
-                st.session_state.quiz = generate_quiz(pdf_text, num_questions)
+                seen_ids = st.session_state.setdefault("seen_quiz_ids", [])
+                st.session_state.quiz = run_model_job("quiz", draw_quiz, pdf_text, num_questions, seen_ids)
+                seen_ids.extend(q["id"] for q in st.session_state.quiz)
+            except JobTimeout as e:
+                st.warning(f"Quiz generation stopped: {e}")
             except Exception as e:
                 st.error(str(e))
     
@@ -185,9 +361,21 @@ def render_pdf_viewer_tab(pdf_text, pdf_file):
             label_visibility="collapsed"
         )
     
-    # Display PDF file info
-    pdf_info = get_pdf_info(pdf_file)
+    # Display PDF file info, parsed once at upload when available
+    pdf_info = st.session_state.get("pdf_info") or get_pdf_info(pdf_file)
     st.info(f"Total Pages: {pdf_info['page_count']}")
+    if "peak_rss" in pdf_info:
+        st.caption(
+            f"File size: {pdf_info['size'] / 2**20:.1f} MB"
+            f"{' (spooled to disk)' if pdf_info['spooled'] else ''} · "
+            f"Peak memory while processing: {pdf_info['peak_rss'] / 2**20:.0f} MB "
+            f"(+{pdf_info['peak_rss_delta'] / 2**20:.1f} MB)"
+        )
+    if "revision_of" in pdf_info:
+        st.caption(
+            f"Revision of a document you uploaded earlier: {len(pdf_info['changed_pages'])} of "
+            f"{pdf_info['page_count']} pages changed, {pdf_info['pages_extracted']} pages extracted"
+        )
 
 def render_export_tab():
     """Render the Export tab content"""
@@ -0,0 +1,169 @@
+"""
+Token and cost ledger for model calls, with per-user and global daily budgets
+"""
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from config import (
+    CACHE_DIR,
+    USER_BUDGET_SOFT,
+    USER_BUDGET_HARD,
+    DAILY_BUDGET_SOFT,
+    DAILY_BUDGET_HARD
+)
+
+LEDGER_PATH = os.path.join(CACHE_DIR, "usage.sqlite3")
+GROUP_COLUMNS = ("user_id", "session_id", "document_hash", "operation", "model", "day")
+
+class BudgetExceeded(Exception):
+    """Raised before a model call when a hard budget has been reached"""
+
+_usage_context = contextvars.ContextVar("usage_context", default={})
+_connection = None
+_lock = threading.Lock()
+
+def set_usage_context(session_id=None, document_hash=None, user_id=None):
+    """
+    Attribute the following model calls in this context to a user, session and document
+
+    Args:
+        session_id (str): Browser session id
+        document_hash (str): Content hash of the document
+        user_id (str): Stable user id; the per-user budget applies to it
+    """
+    _usage_context.set({"session_id": session_id, "document_hash": document_hash, "user_id": user_id})
+
+def _today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+def _get_connection():
+    """Open the ledger database on first use; call with _lock held"""
+    global _connection
+    if _connection is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _connection = sqlite3.connect(LEDGER_PATH, check_same_thread=False)
+        _connection.execute("""
+            CREATE TABLE IF NOT EXISTS usage (
+                timestamp REAL,
+                day TEXT,
+                session_id TEXT,
+                user_id TEXT,
+                document_hash TEXT,
+                operation TEXT,
+                model TEXT,
+                input_tokens INTEGER,
+                output_tokens INTEGER,
+                latency REAL,
+                cost REAL,
+                error TEXT
+            )
+        """)
+        _connection.execute("CREATE INDEX IF NOT EXISTS usage_day ON usage (day)")
+        _connection.commit()
+    return _connection
+
+def record_call(operation, model, input_tokens, output_tokens, latency, cost, error=None):
+    """
+    Record one model call under the current session and document
+
+    Args:
+        operation (str): Operation name
+        model (str): Model name
+        input_tokens (int): Prompt tokens
+        output_tokens (int): Response tokens
+        latency (float): Seconds the call took
+        cost (float): Estimated cost in USD
+        error (str): Error message if the call failed
+    """
+    context = _usage_context.get()
+    with _lock:
+        connection = _get_connection()
+        connection.execute(
+            "INSERT INTO usage (timestamp, day, session_id, document_hash, operation, model, input_tokens, "
+            "output_tokens, latency, cost, error, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), _today(), context.get("session_id"), context.get("document_hash"), operation,
+             model, input_tokens, output_tokens, latency, cost, error, context.get("user_id"))
+        )
+        connection.commit()
+
+def get_budget_status(user_id=None):
+    """
+    Today's spending against the budgets
+
+    Totals are read from the shared ledger on every check, so the budgets
+    hold across all app processes and survive browser refreshes.
+
+    Args:
+        user_id (str): User to check, defaults to the current context's user
+
+    Returns:
+        dict: user_cost, daily_cost, and warning / exceeded flags
+    """
+    if user_id is None:
+        user_id = _usage_context.get().get("user_id")
+    with _lock:
+        daily_cost, user_cost = _get_connection().execute(
+            "SELECT COALESCE(SUM(cost), 0), COALESCE(SUM(CASE WHEN user_id = ? THEN cost END), 0) "
+            "FROM usage WHERE day = ?",
+            (user_id, _today())
+        ).fetchone()
+    return {
+        "user_cost": user_cost,
+        "daily_cost": daily_cost,
+        "user_warning": user_cost >= USER_BUDGET_SOFT,
+        "daily_warning": daily_cost >= DAILY_BUDGET_SOFT,
+        "user_exceeded": user_cost >= USER_BUDGET_HARD,
+        "daily_exceeded": daily_cost >= DAILY_BUDGET_HARD
+    }
+
+def check_budget():
+    """Raise BudgetExceeded if the current user or today's total spending hit a hard budget"""
+    status = get_budget_status()
+    if status["user_exceeded"]:
+        raise BudgetExceeded(
+            f"You reached today's budget of ${USER_BUDGET_HARD:.2f}. "
+            "Cached results are still available."
+        )
+    if status["daily_exceeded"]:
+        raise BudgetExceeded(
+            f"The daily budget of ${DAILY_BUDGET_HARD:.2f} has been reached. Please try again tomorrow."
+        )
+
+def query_usage(group_by="operation", since=None):
+    """
+    Aggregate recorded usage for capacity planning
+
+    Args:
+        group_by (str): One of user_id, session_id, document_hash, operation, model, day
+        since (float): Only include calls after this Unix timestamp
+
+    Returns:
+        list: Dictionaries with the group value, calls, errors, tokens,
+            average latency and cost
+    """
+    if group_by not in GROUP_COLUMNS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_COLUMNS)}")
+    with _lock:
+        rows = _get_connection().execute(f"""
+            SELECT {group_by}, COUNT(*), COUNT(error), SUM(input_tokens), SUM(output_tokens),
+                   AVG(latency), SUM(cost)
+            FROM usage
+            WHERE timestamp >= ?
+            GROUP BY {group_by}
+            ORDER BY SUM(cost) DESC
+        """, (since or 0,)).fetchall()
+    return [
+        {
+            group_by: row[0],
+            "calls": row[1],
+            "errors": row[2],
+            "input_tokens": row[3],
+            "output_tokens": row[4],
+            "avg_latency": row[5],
+            "cost": row[6]
+        }
+        for row in rows
+    ]